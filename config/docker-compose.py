@@ -19,6 +19,9 @@ CACHES = {
         "LOCATION": "redis://cache:6379/1",
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            # or pokemon_v2.compression.ZstdCompressor, with zstandard installed and
+            # pokemon_v2.compression.CompressedClient as the CLIENT_CLASS
+            "COMPRESSOR": "django_redis.compressors.zlib.ZlibCompressor",
         }
     }
 }
@@ -13,5 +13,8 @@ CACHES = {
     }
 }
 
+# Nothing is cached locally, not even in memory
+RESPONSE_CACHE_LOCAL_BYTES = 0
+
 DEBUG = True
 TASTYPIE_FULL_DEBUG = True
@@ -46,6 +46,7 @@ SECRET_KEY = '4nksdock439320df*(^x2_scm-o$*py3e@-awu-n^hipkm%2l$sw$&2l#'
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'pokemon_v2.response_cache.ResponseCacheMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -76,6 +77,9 @@ CACHES = {
         "LOCATION": "redis://127.0.0.1:6379/1",
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            # or pokemon_v2.compression.ZstdCompressor, with zstandard installed and
+            # pokemon_v2.compression.CompressedClient as the CLIENT_CLASS
+            "COMPRESSOR": "django_redis.compressors.zlib.ZlibCompressor",
         }
     }
 }
@@ -104,6 +108,37 @@ INSTALLED_APPS = (
 
 API_LIMIT_PER_PAGE = 1
 
+# Artifacts written by data.v2.build (build generation marker, response snapshots)
+BUILD_ARTIFACTS_DIR = os.path.join(PROJECT_ROOT, 'data', 'v2', 'artifacts')
+
+# Sprite images the build links to, listed in a manifest cached in BUILD_ARTIFACTS_DIR
+SPRITES_DIR = os.path.join(PROJECT_ROOT, 'data', 'v2', 'sprites')
+
+# Base URL the sprite paths stored by the build are served from. Snapshots have
+# it baked in, so they need to be rebuilt after changing it.
+SPRITES_URL = 'https://raw.githubusercontent.com/PokeAPI/sprites/master/sprites/'
+
+# Serve list and detail responses from the prerendered snapshot store when one exists
+SNAPSHOT_MODE = False
+
+# Responses carrying a build generation ETag may be cached this long (in seconds)
+API_CACHE_MAX_AGE = 60 * 60 * 24
+
+# Cache keeping rendered /api/v2/ responses for each build generation, None for no
+# response cache, and how long they are kept (in seconds)
+RESPONSE_CACHE = 'default'
+RESPONSE_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+# Memory each worker may use to keep the responses it served last, in front of
+# RESPONSE_CACHE (in bytes, 0 to go to RESPONSE_CACHE every time)
+RESPONSE_CACHE_LOCAL_BYTES = 32 * 1024 * 1024
+
+# Treat the data as read only between builds: query results are cached by SQL, params and
+# build generation in QUERY_CACHE (for QUERY_CACHE_TIMEOUT seconds) instead of by cachalot
+FROZEN_DATA = False
+QUERY_CACHE = 'default'
+QUERY_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
 TASTYPIE_DEFAULT_FORMATS = ['json']
 
 CORS_ORIGIN_ALLOW_ALL = True
@@ -0,0 +1,301 @@
+#  Benchmarks for the slowest parts of the API, meant to be run against a
+#  database built from data/v2/csv. Jump into the Django shell
+#
+#     $ python manage.py shell
+#
+#  and run one of the benchmarks, e.g.
+#
+#     $ from data.v2.benchmark import benchmark_encounters
+#     $ benchmark_encounters()
+#
+#  Each benchmark prints how long the requests took and how many queries they ran.
+#  benchmark_loaders() rebuilds tables, so don't run it against a live database,
+#  and benchmark_query_cache() needs a published build and the cache of the settings.
+#  benchmark_compression() measures Redis memory when the default cache is django_redis.
+
+
+import os
+import pickle
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django_redis.compressors.identity import IdentityCompressor
+from django_redis.compressors.lzma import LzmaCompressor
+from django_redis.compressors.zlib import ZlibCompressor
+from pokemon_v2 import compression
+from pokemon_v2.generation import current_generation
+from pokemon_v2.models import *
+from pokemon_v2.query_cache import install_query_cache, uninstall_query_cache
+from pokemon_v2.response_cache import CACHED_HEADERS
+from data.v2 import build
+
+
+API_HOST = 'localhost'
+
+# Cache methods which make a round trip to the cache server, and those of them taking many keys
+CACHE_OPERATIONS = ('get', 'get_many', 'set', 'set_many', 'add', 'delete', 'delete_many')
+MANY_KEY_OPERATIONS = ('get_many', 'set_many', 'delete_many')
+
+
+def _measure(function, *args, **kwargs):
+
+    with CaptureQueriesContext(connection) as context:
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+
+    return result, elapsed, len(context.captured_queries)
+
+
+def _report(name, timings):
+
+    total = sum(elapsed for elapsed, queries in timings)
+    slowest = max(elapsed for elapsed, queries in timings)
+    queries = [queries for elapsed, queries in timings]
+
+    print("{0}: {1} runs, {2:.3f}s total, {3:.1f}ms mean, {4:.1f}ms max, {5}-{6} queries".format(
+        name, len(timings), total, 1000 * total / len(timings), 1000 * slowest,
+        min(queries), max(queries)))
+
+
+def _benchmark_urls(name, urls):
+
+    client = Client()
+    timings = []
+
+    for url in urls:
+        response, elapsed, queries = _measure(client.get, url, HTTP_HOST=API_HOST)
+        if response.status_code != 200:
+            raise AssertionError("{0} returned {1}".format(url, response.status_code))
+        timings.append((elapsed, queries))
+
+    _report(name, timings)
+
+
+@contextmanager
+def _count_round_trips(cache):
+
+    counts = {'round_trips': 0, 'keys': 0, 'depth': 0}
+
+    # Backends implement some operations with others (get_many with get), those
+    # still make a single round trip to a cache server
+    def counted(name, method):
+        def inner(*args, **kwargs):
+            if not counts['depth']:
+                counts['round_trips'] += 1
+                counts['keys'] += len(args[0]) if name in MANY_KEY_OPERATIONS else 1
+            counts['depth'] += 1
+            try:
+                return method(*args, **kwargs)
+            finally:
+                counts['depth'] -= 1
+        return inner
+
+    for name in CACHE_OPERATIONS:
+        setattr(cache, name, counted(name, getattr(cache, name)))
+
+    try:
+        yield counts
+    finally:
+        for name in CACHE_OPERATIONS:
+            delattr(cache, name)
+
+
+def benchmark_encounters(pokemon_count=25):
+    """
+    Requests /api/v2/pokemon/<id>/encounters for the pokemon
+    with the most encounters (encounters.csv).
+    """
+
+    pokemon_ids = (Encounter.objects
+                   .values('pokemon_id')
+                   .annotate(encounter_count=Count('id'))
+                   .order_by('-encounter_count', 'pokemon_id')
+                   .values_list('pokemon_id', flat=True)[:pokemon_count])
+
+    print("{0} encounters in the database".format(Encounter.objects.count()))
+
+    _benchmark_urls('pokemon encounters', [
+        '/api/v2/pokemon/{0}/encounters'.format(pokemon_id) for pokemon_id in pokemon_ids
+    ])
+
+
+def benchmark_loaders(stages=("encounters", "moves")):
+    """
+    Rebuilds the given build stages once with the bulk_create loader and
+    once with the default loader of the database.
+    """
+
+    default_loader = build.default_loader()
+
+    try:
+        for loader in (build.BulkCreateLoader, default_loader):
+            build.LOADER = loader
+            timings = []
+
+            for stage in stages:
+                (_, seconds, rows, _), _, queries = _measure(build._run_stage, stage)
+                print("{0} {1}: {2} rows".format(loader.__name__, stage, rows))
+                timings.append((seconds, queries))
+
+            _report(loader.__name__, timings)
+    finally:
+        build.LOADER = default_loader
+
+
+def benchmark_pokemon_species(species_count=25):
+    """
+    Requests /api/v2/pokemon-species/<id> for the species
+    with the most varieties (pokemon.csv).
+    """
+
+    species_ids = (Pokemon.objects
+                   .values('pokemon_species_id')
+                   .annotate(variety_count=Count('id'))
+                   .order_by('-variety_count', 'pokemon_species_id')
+                   .values_list('pokemon_species_id', flat=True)[:species_count])
+
+    _benchmark_urls('pokemon species', [
+        '/api/v2/pokemon-species/{0}/'.format(species_id) for species_id in species_ids
+    ])
+
+
+def benchmark_query_cache(pokemon_count=25):
+    """
+    Requests /api/v2/pokemon/<id>/ and /api/v2/type/<id>/ twice with cachalot
+    and twice with the frozen data query cache (FROZEN_DATA), counting the
+    round trips made to the cache server by each request.
+    """
+
+    if not current_generation():
+        raise AssertionError("no build generation has been published")
+
+    urls = ['/api/v2/pokemon/{0}/'.format(pokemon_id) for pokemon_id in
+            Pokemon.objects.order_by('id').values_list('id', flat=True)[:pokemon_count]]
+    urls += ['/api/v2/type/{0}/'.format(type_id) for type_id in
+             Type.objects.order_by('id').values_list('id', flat=True)]
+
+    client = Client()
+    cache = caches[settings.QUERY_CACHE]
+
+    try:
+        for mode, frozen in (('cachalot', False), ('frozen', True)):
+
+            if frozen:
+                install_query_cache()
+            else:
+                uninstall_query_cache()
+
+            for run in ('first', 'second'):
+                timings = []
+                round_trips = []
+                keys = []
+
+                with override_settings(RESPONSE_CACHE=None), _count_round_trips(cache) as counts:
+                    for url in urls:
+                        before = dict(counts)
+                        response, elapsed, queries = _measure(
+                            client.get, url, HTTP_HOST=API_HOST)
+                        if response.status_code != 200:
+                            raise AssertionError("{0} returned {1}".format(
+                                url, response.status_code))
+                        timings.append((elapsed, queries))
+                        round_trips.append(counts['round_trips'] - before['round_trips'])
+                        keys.append(counts['keys'] - before['keys'])
+
+                name = '{0} ({1} run)'.format(mode, run)
+                _report(name, timings)
+                print("{0}: {1:.1f} cache round trips per request, {2} max, {3:.1f} keys".format(
+                    name, sum(round_trips) / len(round_trips), max(round_trips),
+                    sum(keys) / len(keys)))
+    finally:
+        if settings.FROZEN_DATA:
+            install_query_cache()
+        else:
+            uninstall_query_cache()
+
+
+def _redis_memory(values):
+    """
+    Returns the bytes Redis uses to hold the given values, or None if the
+    default cache isn't django_redis.
+    """
+
+    cache = caches['default']
+
+    if not hasattr(cache, 'client'):
+        return None
+
+    client = cache.client.get_client(write=True)
+    keys = ['benchmark:compression:{0}'.format(index) for index in range(len(values))]
+
+    try:
+        for key, value in zip(keys, values):
+            client.set(key, value)
+        return sum(client.memory_usage(key) for key in keys)
+    finally:
+        client.delete(*keys)
+
+
+def benchmark_compression(document_count=50):
+    """
+    Compresses the response cache entries of /api/v2/pokemon/<id>/ and
+    /api/v2/move/<id>/ with each compressor for django_redis, printing the
+    compression ratio, the time to encode and decode them and the memory
+    Redis needs to hold them.
+    """
+
+    urls = ['/api/v2/pokemon/{0}/'.format(pokemon_id) for pokemon_id in
+            Pokemon.objects.order_by('id').values_list('id', flat=True)[:document_count]]
+    urls += ['/api/v2/move/{0}/'.format(move_id) for move_id in
+             Move.objects.order_by('id').values_list('id', flat=True)[:document_count]]
+
+    client = Client()
+    values = []
+
+    # Served from BASE_URL, so they carry the URLs the cached responses have
+    origin = urlparse(settings.BASE_URL)
+
+    # Pickled as the response cache stores them, with django_redis' default serializer
+    for url in urls:
+        response = client.get(url, HTTP_HOST=origin.netloc, secure=origin.scheme == 'https')
+        headers = [(header, response[header]) for header in CACHED_HEADERS if header in response]
+        values.append(pickle.dumps((headers, response.content), pickle.HIGHEST_PROTOCOL))
+
+    compressors = [
+        ('identity', IdentityCompressor({})),
+        ('zlib', ZlibCompressor({})),
+        ('lzma', LzmaCompressor({})),
+    ]
+
+    if compression.zstandard is not None:
+        dictionary = os.path.exists(compression.dictionary_path(current_generation()))
+        name = 'zstd with dictionary' if dictionary else 'zstd'
+        compressors.append((name, compression.ZstdCompressor({})))
+
+    size = sum(len(value) for value in values)
+    print("{0} entries, {1} bytes".format(len(values), size))
+
+    for name, compressor in compressors:
+
+        start = time.perf_counter()
+        compressed = [compressor.compress(value) for value in values]
+        encode = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for value in compressed:
+            compressor.decompress(value)
+        decode = time.perf_counter() - start
+
+        memory = _redis_memory(compressed)
+
+        print("{0}: {1:.2f}x, {2:.3f}ms encode, {3:.3f}ms decode per entry, {4} in Redis".format(
+            name, size / sum(len(value) for value in compressed),
+            1000 * encode / len(values), 1000 * decode / len(values),
+            'n/a' if memory is None else '{0} bytes'.format(memory)))
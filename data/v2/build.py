@@ -9,15 +9,55 @@
 #
 #  Each time the build script is run it will iterate over each table in the database,
 #  wipe it and rewrite each row using the data found in data/v2/csv.
+#
+#  The tables are built in stages (see BUILD_STAGES). A stage starts as soon as every
+#  stage owning a table it refers to has finished, so on PostgreSQL independent stages
+#  run side by side in separate processes, each with its own connection. Pass
+#  build_all(workers=1) to build one stage at a time.
+#
+#  build_all(incremental=True) only rebuilds the stages whose CSV files or code changed
+#  since the last build, according to the manifest the build keeps, and the stages
+#  depending on them. Their tables are updated row by row instead of being rewritten.
+#
+#  Once every table is written the API responses are rendered into a snapshot and a
+#  new build generation is published, which switches readers over to the new data.
 
 
 import csv
+import hashlib
+import inspect
+import multiprocessing
+import operator
 import os
 import os.path
 import re
 import json
-from django.db import connection
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from cachalot.api import invalidate
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import connection, connections, models, transaction
 from pokemon_v2.models import *
+from pokemon_v2.encounters import location_area_encounter_summaries
+from pokemon_v2.compression import train_dictionary
+from pokemon_v2.evolutions import (
+    clear_species_evolution_chains,
+    evolution_chain_summaries,
+)
+from pokemon_v2.generation import current_generation, publish_generation
+from pokemon_v2.query_cache import (
+    flush_query_cache,
+    install_query_cache,
+    uninstall_query_cache,
+)
+from pokemon_v2.registry import clear_reference_tables
+from pokemon_v2.snapshot import new_snapshot, prune_snapshots, write_resource
+from pokemon_v2.sprites import sprite_manifest
+from pokemon_v2.typechart import clear_type_chart
+from pokemon_v2.urls import router
 
 
 # why this way? how about use `__file__`
@@ -26,23 +66,24 @@ DATA_LOCATION2 = os.path.join(os.path.dirname(__file__), "csv")
 GROUP_RGX = r"\[(.*?)\]\{(.*?)\}"
 SUB_RGX = r"\[.*?\]\{.*?\}"
 
-DB_CURSOR = connection.cursor()
 DB_VENDOR = connection.vendor
 
+# Rows written and CSV files read by the stage running in this process
+STAGE_ROWS = {"count": 0}
+STAGE_FILES = set()
 
-MEDIA_DIR = "/media/sprites/{0}"
-IMAGE_DIR = os.getcwd() + "/data/v2/sprites/"
-RESOURCE_IMAGES = []
-
-for root, dirs, files in os.walk(IMAGE_DIR):
-    for file in files:
-        image_path = os.path.join(root.replace(IMAGE_DIR, ""), file)
-        image_path = image_path.replace("\\", "/")  # convert Windows-style path to Unix
-        RESOURCE_IMAGES.append(image_path)
+BUILD_OPTIONS = {"incremental": False}
 
 
-def file_path_or_none(file_name):
-    return MEDIA_DIR.format(file_name) if file_name in RESOURCE_IMAGES else None
+def file_path_or_none(file_name, sprite_files=None):
+    """
+    Returns the path of a sprite, as stored in the sprite tables, or None if there
+    is no such file. Callers resolving many sprites should pass sprite_manifest()
+    in, which is otherwise looked up (and checked for changes on disk) on every call.
+    """
+    if sprite_files is None:
+        sprite_files = sprite_manifest()
+    return file_name if file_name in sprite_files else None
 
 
 def with_iter(context, iterable=None):
@@ -54,6 +95,7 @@ def with_iter(context, iterable=None):
 
 
 def load_data(file_name):
+    STAGE_FILES.add(file_name)
     # with_iter closes the file when it has finished
     return csv.reader(
         with_iter(open(DATA_LOCATION + file_name, "rt", encoding="utf8")), delimiter=","
@@ -65,41 +107,363 @@ def clear_table(model):
     model.objects.all().delete()
     print("building " + table_name)
     # Reset DB auto increments to start at 1
-    if DB_VENDOR == "sqlite":
-        DB_CURSOR.execute(
-            "DELETE FROM sqlite_sequence WHERE name = " + "'" + table_name + "'"
+    with connection.cursor() as cursor:
+        if DB_VENDOR == "sqlite":
+            cursor.execute(
+                "DELETE FROM sqlite_sequence WHERE name = " + "'" + table_name + "'"
+            )
+        else:
+            cursor.execute(
+                "SELECT setval(pg_get_serial_sequence("
+                + "'"
+                + table_name
+                + "'"
+                + ",'id'), 1, false);"
+            )
+
+
+def preload(model_class, field_name):
+    """
+    Returns {id: value of field_name} for every row of an already built table, so
+    a csv_record_to_objects function doesn't have to run a query per record.
+    """
+    return dict(model_class.objects.values_list("pk", field_name))
+
+
+def preload_ids(model_class):
+    return set(model_class.objects.values_list("pk", flat=True))
+
+
+#############
+#  LOADERS  #
+#############
+
+# A loader writes the objects yielded by a csv_record_to_objects function into the
+# table of one model. build_generic() uses the fastest one the database supports.
+
+
+class BulkCreateLoader:
+    """
+    Inserts the objects through bulk_create, 200 at a time.
+    """
+
+    batch_size = 200
+
+    def __init__(self, model_class):
+        self.model_class = model_class
+        self.batch = []
+
+    def add(self, obj):
+        self.batch.append(obj)
+        # Limit the batch size
+        if len(self.batch) > self.batch_size:
+            self.flush()
+
+    def flush(self):
+        self.model_class.objects.bulk_create(self.batch)
+        STAGE_ROWS["count"] += len(self.batch)
+        self.batch = []
+
+
+# Fields whose values are written to the database as they are
+PLAIN_FIELDS = (
+    models.AutoField,
+    models.BooleanField,
+    models.CharField,
+    models.ForeignKey,
+    models.IntegerField,
+    models.TextField,
+)
+
+
+def row_reader(fields):
+    if len(fields) > 1 and all(isinstance(field, PLAIN_FIELDS) for field in fields):
+        return operator.attrgetter(*[field.attname for field in fields])
+
+    return lambda obj: tuple(
+        field.get_db_prep_save(field.pre_save(obj, True), connection)
+        for field in fields
+    )
+
+
+class RowLoader(BulkCreateLoader):
+    """
+    Converts the objects to rows of column values itself and writes them
+    in large batches, skipping the per object work of bulk_create.
+    """
+
+    batch_size = 10000
+
+    def __init__(self, model_class):
+        super().__init__(model_class)
+        self.table = model_class._meta.db_table
+        self.all_fields = model_class._meta.concrete_fields
+        # Rows without an id get one from the database, like with bulk_create
+        self.fields_without_pk = [
+            field for field in self.all_fields if not field.primary_key
+        ]
+        self.readers = {
+            id(fields): row_reader(fields)
+            for fields in (self.all_fields, self.fields_without_pk)
+        }
+        self.fields = None
+
+    def add(self, obj):
+        fields = self.fields_without_pk if obj.pk is None else self.all_fields
+        if fields is not self.fields:
+            self.flush()
+            self.fields = fields
+            self.read_row = self.readers[id(fields)]
+
+        self.batch.append(self.read_row(obj))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            columns = ", ".join(
+                connection.ops.quote_name(field.column) for field in self.fields
+            )
+            self.write(columns, self.batch)
+            STAGE_ROWS["count"] += len(self.batch)
+        self.batch = []
+
+
+class ExecuteManyLoader(RowLoader):
+    """
+    Inserts the rows with one executemany() call per batch.
+    """
+
+    def write(self, columns, rows):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO {0} ({1}) VALUES ({2})".format(
+                    connection.ops.quote_name(self.table),
+                    columns,
+                    ", ".join(["%s"] * len(self.fields)),
+                ),
+                rows,
+            )
+
+
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def copy_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return str(value).translate(COPY_ESCAPES)
+
+
+class CopyStream:
+    """
+    File-like object handing rows to COPY in its text format as it reads them.
+    """
+
+    def __init__(self, rows):
+        self.lines = (
+            "\t".join(copy_value(value) for value in row) + "\n" for row in rows
         )
-    else:
-        DB_CURSOR.execute(
-            "SELECT setval(pg_get_serial_sequence("
-            + "'"
-            + table_name
-            + "'"
-            + ",'id'), 1, false);"
+        self.buffer = ""
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            self.buffer += line
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+class CopyLoader(RowLoader):
+    """
+    Streams the rows into COPY ... FROM STDIN (PostgreSQL).
+    """
+
+    def write(self, columns, rows):
+        with connection.cursor() as cursor:
+            # COPY is only available on the psycopg2 cursor itself
+            cursor.cursor.copy_expert(
+                "COPY {0} ({1}) FROM STDIN".format(
+                    connection.ops.quote_name(self.table), columns
+                ),
+                CopyStream(rows),
+            )
+
+
+def default_loader():
+    return {"postgresql": CopyLoader, "sqlite": ExecuteManyLoader}.get(
+        DB_VENDOR, BulkCreateLoader
+    )
+
+
+LOADER = default_loader()
+
+
+class DiffLoader:
+    """
+    Used by incremental builds. Compares the objects with the rows already in the
+    table by primary key and only inserts, updates and deletes the differences.
+    """
+
+    def __init__(self, model_class):
+        self.model_class = model_class
+        self.fields = model_class._meta.concrete_fields
+        self.objects = OrderedDict()
+        # Ids the database would give objects without one after clear_table
+        self.next_pk = 1
+
+    def add(self, obj):
+        if obj.pk is None:
+            obj.pk = self.next_pk
+            self.next_pk += 1
+        self.objects[obj.pk] = obj
+
+    def row(self, obj):
+        # Converted the way values read back from the table are
+        return tuple(
+            field.to_python(getattr(obj, field.attname)) for field in self.fields
+        )
+
+    def flush(self):
+        table = self.model_class._meta.db_table
+        attnames = [field.attname for field in self.fields]
+        pk_index = attnames.index(self.model_class._meta.pk.attname)
+
+        current = {
+            row[pk_index]: row
+            for row in self.model_class.objects.values_list(*attnames).iterator()
+        }
+
+        deleted = [pk for pk in current if pk not in self.objects]
+        updated = []
+        inserted = 0
+        loader = LOADER(self.model_class)
+
+        for pk, obj in self.objects.items():
+            row = self.row(obj)
+            if pk not in current:
+                # The loader writes its batch out whenever it fills up
+                loader.add(obj)
+                inserted += 1
+            elif row != current[pk]:
+                updated.append(row[:pk_index] + row[pk_index + 1 :] + (pk,))
+
+        print(
+            "updating {0}: {1} inserted, {2} updated, {3} deleted".format(
+                table, inserted, len(updated), len(deleted)
+            )
         )
 
+        for start in range(0, len(deleted), 500):
+            self.model_class.objects.filter(
+                pk__in=deleted[start : start + 500]
+            ).delete()
+
+        with connection.cursor() as cursor:
+            if updated:
+                cursor.executemany(
+                    "UPDATE {0} SET {1} WHERE {2} = %s".format(
+                        connection.ops.quote_name(table),
+                        ", ".join(
+                            connection.ops.quote_name(field.column) + " = %s"
+                            for field in self.fields
+                            if not field.primary_key
+                        ),
+                        connection.ops.quote_name(self.model_class._meta.pk.column),
+                    ),
+                    updated,
+                )
+
+            loader.flush()
+
+            # The ids were inserted explicitly, move the sequence past them
+            model_classes = [self.model_class]
+            for sql in connection.ops.sequence_reset_sql(no_style(), model_classes):
+                cursor.execute(sql)
+
+        STAGE_ROWS["count"] += len(updated) + len(deleted)
+        self.objects = OrderedDict()
+
+
+def table_loader(model_class):
+    if BUILD_OPTIONS["incremental"]:
+        return DiffLoader(model_class)
+
+    clear_table(model_class)
+    return LOADER(model_class)
+
 
 def build_generic(model_classes, file_name, csv_record_to_objects):
-    batches = {}
-    for model_class in model_classes:
-        clear_table(model_class)
-        batches[model_class] = []  # one batch per model class
+    # The whole file is written in one transaction, which also lets the rows of
+    # several models refer to each other in any order (constraints are deferred)
+    with transaction.atomic():
+        loaders = {}
+        for model_class in model_classes:
+            loaders[model_class] = table_loader(model_class)  # one per model class
+
+        csv_data = load_data(file_name)
+        next(csv_data, None)  # skip header
+
+        for csv_record in csv_data:
+            for obj in csv_record_to_objects(csv_record):
+                loaders[type(obj)].add(obj)
 
-    csv_data = load_data(file_name)
-    next(csv_data, None)  # skip header
+        for loader in loaders.values():
+            loader.flush()
 
-    for csv_record in csv_data:
-        for obj in csv_record_to_objects(csv_record):
-            model_class = type(obj)
-            batches[model_class].append(obj)
+        check_references(model_classes)
 
-            # Limit the batch size
-            if len(batches[model_class]) > 200:
-                model_class.objects.bulk_create(batches[model_class])
-                batches[model_class] = []
+    # Raw inserts don't go through the query cache invalidation
+    invalidate(*model_classes)
 
-    for model_class, batch in batches.items():
-        model_class.objects.bulk_create(batch)
+
+class DanglingReferences(Exception):
+    pass
+
+
+def check_references(model_classes):
+    """
+    Looks for foreign keys pointing at rows which don't exist, with one query per
+    foreign key rather than one per row, and reports all of them at once. Raised
+    before the transaction commits, so the database rejecting a single row doesn't
+    hide the others.
+    """
+    dangling = []
+
+    for model_class in model_classes:
+        for field in model_class._meta.concrete_fields:
+            if not field.is_relation:
+                continue
+
+            related_ids = field.related_model.objects.values("pk")
+            missing_ids = list(
+                model_class.objects.filter(**{field.attname + "__isnull": False})
+                .exclude(**{field.attname + "__in": related_ids})
+                .order_by(field.attname)
+                .values_list(field.attname, flat=True)
+                .distinct()
+            )
+
+            if missing_ids:
+                dangling.append(
+                    "{0}.{1}: {2} missing {3} id(s): {4}".format(
+                        model_class._meta.db_table,
+                        field.column,
+                        len(missing_ids),
+                        field.related_model._meta.db_table,
+                        ", ".join(str(missing_id) for missing_id in missing_ids[:20])
+                        + (", ..." if len(missing_ids) > 20 else ""),
+                    )
+                )
+
+    if dangling:
+        raise DanglingReferences("dangling references:\n    " + "\n    ".join(dangling))
 
 
 def scrub_str(string):
@@ -476,6 +840,8 @@ def _build_items():
 
     build_generic((Item,), "items.csv", csv_record_to_objects)
 
+    sprite_files = sprite_manifest()
+
     def csv_record_to_objects(info):
         if re.search(r"^data-card", info[1]):
             file_name = "data-card.png"
@@ -487,9 +853,10 @@ def _build_items():
             file_name = "%s.png" % info[1]
 
         item_sprites = "items/{0}"
-        sprites = {"default": file_path_or_none(item_sprites.format(file_name))}
         yield ItemSprites(
-            id=int(info[0]), item_id=int(info[0]), sprites=json.dumps(sprites)
+            id=int(info[0]),
+            item_id=int(info[0]),
+            default=file_path_or_none(item_sprites.format(file_name), sprite_files),
         )
 
     build_generic((ItemSprites,), "items.csv", csv_record_to_objects)
@@ -787,14 +1154,13 @@ def _build_moves():
 
     build_generic((MoveFlavorText,), "move_flavor_text.csv", csv_record_to_objects)
 
+    move_effect_ids = preload_ids(MoveEffect)
+
     def csv_record_to_objects(info):
-        _move_effect = None
-        try:
-            _move_effect = (
-                MoveEffect.objects.get(pk=int(info[6])) if info[6] != "" else None
-            )
-        except:
-            pass
+        # Changes can refer to effects which don't exist
+        _move_effect_id = int(info[6]) if info[6] != "" else None
+        if _move_effect_id not in move_effect_ids:
+            _move_effect_id = None
 
         yield MoveChange(
             move_id=int(info[0]),
@@ -803,7 +1169,7 @@ def _build_moves():
             power=int(info[3]) if info[3] != "" else None,
             pp=int(info[4]) if info[4] != "" else None,
             accuracy=int(info[5]) if info[5] != "" else None,
-            move_effect_id=_move_effect.pk if _move_effect else None,
+            move_effect_id=_move_effect_id,
             move_effect_chance=int(info[7]) if info[7] != "" else None,
         )
 
@@ -944,12 +1310,14 @@ def _build_berries():
         (BerryFirmnessName,), "berry_firmness_names.csv", csv_record_to_objects
     )
 
+    item_names = preload(Item, "name")
+
     def csv_record_to_objects(info):
-        item = Item.objects.get(pk=int(info[1]))
+        item_name = item_names[int(info[1])]
         yield Berry(
             id=int(info[0]),
             item_id=int(info[1]),
-            name=item.name[: item.name.index("-")],
+            name=item_name[: item_name.index("-")],
             berry_firmness_id=int(info[2]),
             natural_gift_power=int(info[3]),
             natural_gift_type_id=int(info[4]),
@@ -962,15 +1330,18 @@ def _build_berries():
 
     build_generic((Berry,), "berries.csv", csv_record_to_objects)
 
-    def csv_record_to_objects(info):
-        # Get the english name for this contest type
-        contest_type_name = ContestTypeName.objects.get(
-            contest_type_id=int(info[0]), language_id=9
+    # The english names of the contest types
+    contest_type_flavors = dict(
+        ContestTypeName.objects.filter(language_id=9).values_list(
+            "contest_type_id", "flavor"
         )
+    )
+
+    def csv_record_to_objects(info):
         yield BerryFlavor(
             id=int(info[0]),
-            name=contest_type_name.flavor.lower(),
-            contest_type=ContestType.objects.get(pk=int(info[0])),
+            name=contest_type_flavors[int(info[0])].lower(),
+            contest_type_id=int(info[0]),
         )
 
     # This is not an error
@@ -1000,26 +1371,26 @@ def _build_berries():
 
 def _build_natures():
     def csv_record_to_objects(info):
-        decreased_stat = None
-        increased_stat = None
-        hates_flavor = None
-        likes_flavor = None
+        decreased_stat_id = None
+        increased_stat_id = None
+        hates_flavor_id = None
+        likes_flavor_id = None
 
         if info[2] != info[3]:
-            decreased_stat = Stat.objects.get(pk=int(info[2]))
-            increased_stat = Stat.objects.get(pk=int(info[3]))
+            decreased_stat_id = int(info[2])
+            increased_stat_id = int(info[3])
 
         if info[4] != info[5]:
-            hates_flavor = BerryFlavor.objects.get(pk=int(info[4]))
-            likes_flavor = BerryFlavor.objects.get(pk=int(info[5]))
+            hates_flavor_id = int(info[4])
+            likes_flavor_id = int(info[5])
 
         yield Nature(
             id=int(info[0]),
             name=info[1],
-            decreased_stat=decreased_stat,
-            increased_stat=increased_stat,
-            hates_flavor=hates_flavor,
-            likes_flavor=likes_flavor,
+            decreased_stat_id=decreased_stat_id,
+            increased_stat_id=increased_stat_id,
+            hates_flavor_id=hates_flavor_id,
+            likes_flavor_id=likes_flavor_id,
             game_index=info[6],
         )
 
@@ -1126,6 +1497,18 @@ def _build_evolutions():
     )
 
 
+def _build_evolution_chains():
+    # The trees are put together from the species and their evolutions, so this
+    # runs once the pokemons stage has written them
+    with transaction.atomic():
+        loader = table_loader(EvolutionChainSummary)
+        for summary in evolution_chain_summaries():
+            loader.add(summary)
+        loader.flush()
+
+    invalidate(EvolutionChainSummary)
+
+
 #############
 #  POKEDEX  #
 #############
@@ -1197,15 +1580,17 @@ def _build_locations():
         (LocationGameIndex,), "location_game_indices.csv", csv_record_to_objects
     )
 
+    location_names = preload(Location, "name")
+
     def csv_record_to_objects(info):
-        location = Location.objects.get(pk=int(info[1]))
+        location_name = location_names[int(info[1])]
         yield LocationArea(
             id=int(info[0]),
             location_id=int(info[1]),
             game_index=int(info[2]),
-            name="{}-{}".format(location.name, info[3])
+            name="{}-{}".format(location_name, info[3])
             if info[3]
-            else "{}-{}".format(location.name, "area"),
+            else "{}-{}".format(location_name, "area"),
         )
 
     build_generic((LocationArea,), "location_areas.csv", csv_record_to_objects)
@@ -1261,7 +1646,9 @@ def _build_pokemons():
             id=int(info[0]),
             name=info[1],
             generation_id=int(info[2]),
-            evolves_from_species=None,
+            # Species can evolve from species further down the file, the foreign
+            # key is only checked when the transaction commits
+            evolves_from_species_id=int(info[3]) if info[3] != "" else None,
             evolution_chain_id=int(info[4]),
             pokemon_color_id=int(info[5]),
             pokemon_shape_id=int(info[6]),
@@ -1279,18 +1666,6 @@ def _build_pokemons():
 
     build_generic((PokemonSpecies,), "pokemon_species.csv", csv_record_to_objects)
 
-    # PokemonSpecies.evolves_from_species can't be set until all the species are created
-    data = load_data("pokemon_species.csv")
-    for index, info in enumerate(data):
-        if index > 0:
-            evolves = (
-                PokemonSpecies.objects.get(pk=int(info[3])) if info[3] != "" else None
-            )
-            if evolves:
-                species = PokemonSpecies.objects.get(pk=int(info[0]))
-                species.evolves_from_species = evolves
-                species.save()
-
     def csv_record_to_objects(info):
         yield PokemonSpeciesName(
             pokemon_species_id=int(info[0]),
@@ -1342,33 +1717,41 @@ def _build_pokemons():
 
     build_generic((Pokemon,), "pokemon.csv", csv_record_to_objects)
 
+    sprite_files = sprite_manifest()
+
     def csv_record_to_objects(info):
         file_name = "%s.png" % info[0]
         poke_sprites = "pokemon/{0}"
         sprites = {
-            "front_default": file_path_or_none(poke_sprites.format(file_name)),
+            "front_default": file_path_or_none(
+                poke_sprites.format(file_name), sprite_files
+            ),
             "front_female": file_path_or_none(
-                poke_sprites.format("female/" + file_name)
+                poke_sprites.format("female/" + file_name), sprite_files
+            ),
+            "front_shiny": file_path_or_none(
+                poke_sprites.format("shiny/" + file_name), sprite_files
             ),
-            "front_shiny": file_path_or_none(poke_sprites.format("shiny/" + file_name)),
             "front_shiny_female": file_path_or_none(
-                poke_sprites.format("shiny/female/" + file_name)
+                poke_sprites.format("shiny/female/" + file_name), sprite_files
+            ),
+            "back_default": file_path_or_none(
+                poke_sprites.format("back/" + file_name), sprite_files
             ),
-            "back_default": file_path_or_none(poke_sprites.format("back/" + file_name)),
             "back_female": file_path_or_none(
-                poke_sprites.format("back/female/" + file_name)
+                poke_sprites.format("back/female/" + file_name), sprite_files
             ),
             "back_shiny": file_path_or_none(
-                poke_sprites.format("back/shiny/" + file_name)
+                poke_sprites.format("back/shiny/" + file_name), sprite_files
             ),
             "back_shiny_female": file_path_or_none(
-                poke_sprites.format("back/shiny/female/" + file_name)
+                poke_sprites.format("back/shiny/female/" + file_name), sprite_files
             ),
         }
         yield PokemonSprites(
             id=int(info[0]),
-            pokemon=Pokemon.objects.get(pk=int(info[0])),
-            sprites=json.dumps(sprites),
+            pokemon_id=int(info[0]),
+            **sprites,
         )
 
     build_generic((PokemonSprites,), "pokemon.csv", csv_record_to_objects)
@@ -1441,37 +1824,43 @@ def _build_pokemons():
 
     build_generic((PokemonForm,), "pokemon_forms.csv", csv_record_to_objects)
 
+    pokemon_species_ids = preload(Pokemon, "pokemon_species_id")
+    sprite_files = sprite_manifest()
+
     def csv_record_to_objects(info):
-        pokemon = Pokemon.objects.get(pk=int(info[3]))
+        pokemon_species_id = pokemon_species_ids[int(info[3])]
         if info[2]:
             if re.search(r"^mega", info[2]):
                 file_name = "%s.png" % info[3]
             else:
-                file_name = "%s-%s.png" % (
-                    getattr(pokemon, "pokemon_species_id"),
-                    info[2],
-                )
+                file_name = "%s-%s.png" % (pokemon_species_id, info[2])
         else:
-            file_name = "%s.png" % getattr(pokemon, "pokemon_species_id")
+            file_name = "%s.png" % pokemon_species_id
         poke_sprites = "pokemon/{0}"
         sprites = {
-            "front_default": file_path_or_none(poke_sprites.format(file_name)),
-            "front_shiny": file_path_or_none(poke_sprites.format("shiny/" + file_name)),
-            "back_default": file_path_or_none(poke_sprites.format("back/" + file_name)),
+            "front_default": file_path_or_none(
+                poke_sprites.format(file_name), sprite_files
+            ),
+            "front_shiny": file_path_or_none(
+                poke_sprites.format("shiny/" + file_name), sprite_files
+            ),
+            "back_default": file_path_or_none(
+                poke_sprites.format("back/" + file_name), sprite_files
+            ),
             "back_shiny": file_path_or_none(
-                poke_sprites.format("back/shiny/" + file_name)
+                poke_sprites.format("back/shiny/" + file_name), sprite_files
             ),
         }
         yield PokemonFormSprites(
-            id=int(info[0]), pokemon_form_id=int(info[0]), sprites=json.dumps(sprites)
+            id=int(info[0]), pokemon_form_id=int(info[0]), **sprites
         )
 
     build_generic((PokemonFormSprites,), "pokemon_forms.csv", csv_record_to_objects)
 
     def csv_record_to_objects(info):
         yield PokemonFormName(
-            pokemon_form=PokemonForm.objects.get(pk=int(info[0])),
-            language=Language.objects.get(pk=int(info[1])),
+            pokemon_form_id=int(info[0]),
+            language_id=int(info[1]),
             name=info[2],
             pokemon_name=info[3],
         )
@@ -1661,6 +2050,14 @@ def _build_encounters():
         csv_record_to_objects,
     )
 
+    with transaction.atomic():
+        loader = table_loader(LocationAreaEncounterSummary)
+        for summary in location_area_encounter_summaries():
+            loader.add(summary)
+        loader.flush()
+
+    invalidate(LocationAreaEncounterSummary)
+
 
 ##############
 #  PAL PARK  #
@@ -1691,32 +2088,325 @@ def _build_pal_parks():
     build_generic((PalPark,), "pal_park.csv", csv_record_to_objects)
 
 
-def build_all():
-    _build_languages()
-    _build_regions()
-    _build_generations()
-    _build_versions()
-    _build_damage_classes()
-    _build_stats()
-    _build_abilities()
-    _build_characteristics()
-    _build_egg_groups()
-    _build_growth_rates()
-    _build_items()
-    _build_types()
-    _build_contests()
-    _build_moves()
-    _build_berries()
-    _build_natures()
-    _build_genders()
-    _build_experiences()
-    _build_machines()
-    _build_evolutions()
-    _build_pokedexes()
-    _build_locations()
-    _build_pokemons()
-    _build_encounters()
-    _build_pal_parks()
+##############
+#  SNAPSHOT  #
+##############
+
+
+def _build_snapshots():
+    generation = current_generation() + 1
+    path = new_snapshot(generation)
+
+    # The tables this process holds in memory are only reloaded once the new
+    # generation is published, which is too late for the snapshot
+    clear_reference_tables()
+    clear_species_evolution_chains()
+    clear_type_chart()
+    documents = 0
+
+    for prefix, viewset, basename in router.registry:
+        print("rendering " + prefix)
+        documents += write_resource(path, viewset, basename)
+
+    # Only with zstandard installed, for pokemon_v2.compression.ZstdCompressor
+    dictionary_size = train_dictionary(generation, path)
+    if dictionary_size is not None:
+        print("trained a {0} byte compression dictionary".format(dictionary_size))
+
+    publish_generation(generation)
+    prune_snapshots(generation)
+
+    return documents
+
+
+##############
+#  PIPELINE  #
+##############
+
+# Every stage with the stages owning the tables its rows refer to
+# through foreign keys. Those have to be written first.
+BUILD_STAGES = OrderedDict(
+    [
+        ("languages", (_build_languages, ())),
+        ("regions", (_build_regions, ("languages",))),
+        ("generations", (_build_generations, ("languages", "regions"))),
+        ("versions", (_build_versions, ("languages", "regions", "generations"))),
+        ("damage_classes", (_build_damage_classes, ("languages",))),
+        ("stats", (_build_stats, ("languages", "damage_classes"))),
+        ("abilities", (_build_abilities, ("languages", "generations", "versions"))),
+        ("characteristics", (_build_characteristics, ("languages", "stats"))),
+        ("egg_groups", (_build_egg_groups, ("languages",))),
+        ("growth_rates", (_build_growth_rates, ("languages",))),
+        ("items", (_build_items, ("languages", "generations", "versions"))),
+        ("types", (_build_types, ("languages", "generations", "damage_classes"))),
+        ("contests", (_build_contests, ("languages",))),
+        (
+            "moves",
+            (
+                _build_moves,
+                (
+                    "languages",
+                    "generations",
+                    "versions",
+                    "damage_classes",
+                    "stats",
+                    "types",
+                    "contests",
+                ),
+            ),
+        ),
+        ("berries", (_build_berries, ("languages", "items", "types", "contests"))),
+        ("natures", (_build_natures, ("languages", "stats", "moves", "berries"))),
+        ("genders", (_build_genders, ())),
+        ("experiences", (_build_experiences, ("growth_rates",))),
+        ("machines", (_build_machines, ("versions", "growth_rates", "items", "moves"))),
+        ("evolutions", (_build_evolutions, ("languages", "items"))),
+        ("pokedexes", (_build_pokedexes, ("languages", "regions", "versions"))),
+        ("locations", (_build_locations, ("languages", "regions", "generations"))),
+        (
+            "pokemons",
+            (
+                _build_pokemons,
+                (
+                    "languages",
+                    "generations",
+                    "versions",
+                    "stats",
+                    "abilities",
+                    "egg_groups",
+                    "growth_rates",
+                    "items",
+                    "types",
+                    "moves",
+                    "genders",
+                    "evolutions",
+                    "pokedexes",
+                    "locations",
+                ),
+            ),
+        ),
+        (
+            "encounters",
+            (_build_encounters, ("languages", "versions", "locations", "pokemons")),
+        ),
+        ("pal_parks", (_build_pal_parks, ("languages", "pokemons"))),
+        ("evolution_chains", (_build_evolution_chains, ("evolutions", "pokemons"))),
+    ]
+)
+
+
+def _run_stage(name):
+    STAGE_ROWS["count"] = 0
+    STAGE_FILES.clear()
+    start = time.time()
+
+    BUILD_STAGES[name][0]()
+
+    files = {file_name: file_hash(file_name) for file_name in sorted(STAGE_FILES)}
+    return name, time.time() - start, STAGE_ROWS["count"], files
+
+
+def _ready_stages(stages, done, started):
+    return [
+        name
+        for name in stages
+        if name not in started
+        and all(dependency in done for dependency in BUILD_STAGES[name][1])
+    ]
+
+
+def _run_stages(workers, stages):
+    results = []
+
+    if workers == 1:
+        for name in stages:
+            results.append(_run_stage(name))
+        return results
+
+    # Forked workers must not share the connection of this process
+    connections.close_all()
+
+    # Stages which aren't rebuilt count as done
+    done = set(BUILD_STAGES) - set(stages)
+    running = {}
+    context = multiprocessing.get_context("fork")
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        while len(done) < len(BUILD_STAGES):
+            for name in _ready_stages(stages, done, done | set(running.values())):
+                running[executor.submit(_run_stage, name)] = name
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in finished:
+                results.append(future.result())
+                done.add(running.pop(future))
+
+    return sorted(results, key=lambda result: stages.index(result[0]))
+
+
+def _default_workers():
+    # SQLite only allows one writer at a time
+    if DB_VENDOR == "sqlite" or "fork" not in multiprocessing.get_all_start_methods():
+        return 1
+    return os.cpu_count() or 1
+
+
+##############
+#  MANIFEST  #
+##############
+
+# The manifest records, for every stage of the last build, a hash of its code and
+# of each CSV file it read. Incremental builds compare them with the current ones.
+# The code of a stage is its own function along with everything it may call: the
+# rest of this module (loaders, helpers) and the modules in SHARED_CODE_MODULES,
+# so changing any of those rebuilds every stage.
+
+MANIFEST_FILE = "build-manifest.json"
+
+SHARED_CODE_MODULES = (
+    "pokemon_v2.models",
+    "pokemon_v2.encounters",
+    "pokemon_v2.evolutions",
+    "pokemon_v2.sprites",
+)
+
+_shared_code = {"hash": None}
+
+
+def manifest_path():
+    return os.path.join(settings.BUILD_ARTIFACTS_DIR, MANIFEST_FILE)
+
+
+def read_manifest():
+    try:
+        with open(manifest_path(), "rt") as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return {"stages": {}}
+
+
+def write_manifest(manifest):
+    path = manifest_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    temp_path = "{0}.{1}".format(path, os.getpid())
+    with open(temp_path, "wt") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+def file_hash(file_name):
+    digest = hashlib.sha1()
+    try:
+        with open(DATA_LOCATION + file_name, "rb") as data_file:
+            for chunk in iter(lambda: data_file.read(1 << 16), b""):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def shared_code_hash():
+    if _shared_code["hash"] is None:
+        # This module without the stage functions, so editing one only rebuilds its stage
+        source = inspect.getsource(sys.modules[__name__])
+        for function, _ in BUILD_STAGES.values():
+            source = source.replace(inspect.getsource(function), "")
+
+        digest = hashlib.sha1(source.encode("utf8"))
+        for module_name in SHARED_CODE_MODULES:
+            digest.update(inspect.getsource(sys.modules[module_name]).encode("utf8"))
+
+        _shared_code["hash"] = digest.hexdigest()
+
+    return _shared_code["hash"]
+
+
+def code_hash(name):
+    source = inspect.getsource(BUILD_STAGES[name][0])
+    digest = hashlib.sha1(source.encode("utf8"))
+    digest.update(shared_code_hash().encode("utf8"))
+    return digest.hexdigest()
+
+
+def _changed_stages(manifest):
+    changed = []
+
+    for name in BUILD_STAGES:
+        entry = manifest["stages"].get(name)
+        if (
+            entry is None
+            or entry["code"] != code_hash(name)
+            or any(
+                file_hash(file_name) != digest
+                for file_name, digest in entry["files"].items()
+            )
+        ):
+            changed.append(name)
+
+    return changed
+
+
+def _with_dependents(stages):
+    # BUILD_STAGES lists every stage after its dependencies
+    stages = set(stages)
+    for name, (_, dependencies) in BUILD_STAGES.items():
+        if stages.intersection(dependencies):
+            stages.add(name)
+    return [name for name in BUILD_STAGES if name in stages]
+
+
+def _print_report(results):
+    print("{0:<20}{1:>10}{2:>12}".format("stage", "seconds", "rows"))
+    for name, seconds, rows in results:
+        print("{0:<20}{1:>10.1f}{2:>12}".format(name, seconds, rows))
+
+
+def build_all(workers=None, incremental=False):
+    workers = workers or _default_workers()
+    start = time.time()
+    manifest = read_manifest()
+    generation = current_generation()
+
+    # The build reads the tables it writes, cached results would be stale
+    uninstall_query_cache()
+
+    try:
+        stages = list(BUILD_STAGES)
+
+        if incremental:
+            stages = _with_dependents(_changed_stages(manifest))
+            if not stages:
+                print("nothing changed since the last build")
+                return
+            print("rebuilding " + ", ".join(stages))
+
+        BUILD_OPTIONS["incremental"] = incremental
+        try:
+            results = _run_stages(workers, stages)
+        finally:
+            BUILD_OPTIONS["incremental"] = False
+
+        report = []
+        for name, seconds, rows, files in results:
+            manifest["stages"][name] = {"code": code_hash(name), "files": files}
+            report.append((name, seconds, rows))
+        rows = sum(stage_rows for _, _, stage_rows in report)
+
+        snapshots_start = time.time()
+        documents = _build_snapshots()
+        write_manifest(manifest)
+        flush_query_cache(generation)
+
+        report.append(("snapshots", time.time() - snapshots_start, documents))
+        report.append(("total", time.time() - start, rows))
+
+        _print_report(report)
+    finally:
+        # Back to the cache for the queries made after the build in this process
+        if settings.FROZEN_DATA:
+            install_query_cache()
 
 
 if __name__ == "__main__":
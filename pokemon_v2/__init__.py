@@ -0,0 +1 @@
+default_app_config = 'pokemon_v2.apps.PokemonV2Config'
@@ -1,19 +1,60 @@
 import re
-from rest_framework import viewsets
+from collections import OrderedDict
+from rest_framework import generics, viewsets
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.conf import settings
+from django.db.models import Q
 from django.shortcuts import get_object_or_404
-from django.http import Http404
+from django.http import Http404, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
 
 from .models import *
 from .serializers import *
+from .snapshot import get_snapshot, render_page, snapshot_response
+from .evolutions import species_evolution_chains
+from .generation import generation_etag
+from .fieldsets import prune_fields, requested_fieldsets
+from .languages import requested_language
+from .prefetch import query_plan
+from .registry import requested_reference
+from .response_cache import response_cache_stats
+from .typechart import type_chart
 
 # pylint: disable=no-member, attribute-defined-outside-init
 
+# Narrows the moves of a pokemon down to one version group, by name or id
+VERSION_GROUP_PARAM = 'version_group'
+
 ###########################
 #  BEHAVIOR ABSTRACTIONS  #
 ###########################
 
+class GenerationETags():
+    """
+    Mixin to tag responses with an ETag of the build generation
+    (see generation.py), answering requests which already have
+    it with a 304 before any query or serialization is made.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        etag = generation_etag(request) if request.method in ('GET', 'HEAD') else None
+        known_etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+
+        if etag is not None and (etag in known_etags or '*' in known_etags):
+            response = HttpResponseNotModified()
+        else:
+            response = super().dispatch(request, *args, **kwargs)
+
+        if etag is not None and response.status_code in (200, 304):
+            response['ETag'] = etag
+            patch_cache_control(response, public=True, max_age=settings.API_CACHE_MAX_AGE)
+
+        return response
+
+
 class ListOrDetailSerialRelation():
     """
     Mixin to allow association with separate serializers
@@ -53,9 +94,182 @@ class NameOrIdRetrieval():
 
         return resp
 
+    def get_objects(self, lookups):
+        """
+        Returns {lookup: object} for the objects found by pk or by name,
+        fetched with one query (along with their prefetches).
+        """
+
+        queryset = self.filter_queryset(self.get_queryset())
+
+        ids = set(int(lookup) for lookup in lookups if self.idPattern.match(lookup))
+        names = set(
+            lookup for lookup in lookups
+            if not self.idPattern.match(lookup) and self.namePattern.match(lookup))
+
+        condition = Q(pk__in=ids)
+        if names and any(field.name == 'name' for field in queryset.model._meta.fields):
+            condition |= Q(name__in=names)
+
+        objects = {}
+
+        for obj in queryset.filter(condition):
+            objects[str(obj.pk)] = obj
+            if getattr(obj, 'name', None) in names:
+                objects[obj.name] = obj
+
+        # Ids may also be written with leading zeros or a sign
+        return {
+            lookup: objects.get(str(int(lookup)) if self.idPattern.match(lookup) else lookup)
+            for lookup in lookups}
+
+
+class BatchRetrieval():
+    """
+    Mixin to retrieve many resources at once with ?ids=1,2,name,...
+    on the list endpoint. The resources come back in the order they
+    were asked for, with a not found marker for the missing ones.
+    """
+
+    batch_param = 'ids'
+    max_batch_size = 100
+
+    def get_batch_lookups(self):
+        if self.action != 'list' or self.batch_param not in self.request.query_params:
+            return None
+
+        lookups = [
+            lookup for lookup in self.request.query_params[self.batch_param].split(',') if lookup]
+
+        if len(lookups) > self.max_batch_size:
+            raise ValidationError({
+                self.batch_param: 'At most {} resources at once.'.format(self.max_batch_size)})
+
+        return lookups
+
+    def get_serializer_class(self):
+        if self.get_batch_lookups() is not None:
+            return self.serializer_class
+        return super().get_serializer_class()
+
+    def list(self, request, *args, **kwargs):
+        lookups = self.get_batch_lookups()
+
+        if lookups is None:
+            return super().list(request, *args, **kwargs)
+
+        objects = self.get_objects(lookups)
+
+        # Every object is serialized once, in one pass sharing the serializer
+        found = list(OrderedDict(
+            (obj.pk, obj) for obj in objects.values() if obj is not None).values())
+        data = dict(zip(
+            (obj.pk for obj in found), self.get_serializer(found, many=True).data))
+
+        results = []
+
+        for lookup in lookups:
+            if objects[lookup] is not None:
+                results.append(data[objects[lookup].pk])
+            else:
+                results.append(OrderedDict((
+                    ('lookup', lookup), ('status', 404), ('detail', 'Not found.'))))
+
+        return Response(OrderedDict((('count', len(results)), ('results', results))))
+
+
+class SnapshotRetrieval():
+    """
+    Mixin to answer list and detail requests with the responses
+    prerendered by the build (see snapshot.py) when SNAPSHOT_MODE
+    is on. Anything the snapshot can't answer, including requests
+    with unknown query params, goes through the serializers.
+    """
+
+    snapshot_list_params = frozenset(('limit', 'offset'))
+
+    def get_snapshot_resource(self, allowed_params):
+        if not settings.SNAPSHOT_MODE:
+            return None
+        if set(self.request.query_params) - allowed_params:
+            return None
+        snapshot = get_snapshot()
+        return snapshot.resource(self.basename) if snapshot else None
+
+    def get_snapshot_detail(self, resource):
+        lookup = self.kwargs['pk']
+
+        if NameOrIdRetrieval.idPattern.match(lookup):
+            return resource.by_id(int(lookup))
+
+        if isinstance(self, NameOrIdRetrieval) and self.namePattern.match(lookup):
+            return resource.by_name(lookup)
+
+        return None
+
+    def list(self, request, *args, **kwargs):
+        resource = self.get_snapshot_resource(self.snapshot_list_params)
+
+        if resource is None:
+            return super().list(request, *args, **kwargs)
+
+        page = self.paginate_queryset(resource.summaries)
+        envelope = self.get_paginated_response([]).data
+        return snapshot_response(render_page(envelope, page), request)
+
+    def retrieve(self, request, *args, **kwargs):
+        resource = self.get_snapshot_resource(frozenset())
+        content = self.get_snapshot_detail(resource) if resource else None
+
+        if content is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        return snapshot_response(content, request)
+
+
+class PlannedPrefetching():
+    """
+    Mixin to fetch the relations the serializer is going to
+    follow along with the queryset (see prefetch.py).
+    """
+
+    def get_queryset(self):
+        query_params = self.request.query_params
+        plan = query_plan(self.get_serializer_class(), requested_fieldsets(query_params))
+        return plan.apply(super().get_queryset(), requested_language(query_params))
+
+
+class SparseFieldsets():
+    """
+    Mixin to leave out the fields not asked for with
+    ?fields= or ?exclude= (see fieldsets.py).
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fieldsets = requested_fieldsets(self.request.query_params)
 
-class PokeapiCommonViewset(ListOrDetailSerialRelation,
-                           NameOrIdRetrieval, viewsets.ReadOnlyModelViewSet):
+        if fieldsets is not None:
+            prune_fields(serializer, fieldsets.fields, fieldsets.exclude)
+
+        return serializer
+
+
+class LanguageFiltering():
+    """
+    Mixin to pass the language asked for with ?lang= on to
+    the serializers (see languages.py).
+    """
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['language_id'] = requested_language(self.request.query_params)
+        return context
+
+
+class PokeapiCommonViewset(GenerationETags, SnapshotRetrieval, BatchRetrieval,
+                           ListOrDetailSerialRelation, PlannedPrefetching, SparseFieldsets,
+                           LanguageFiltering, NameOrIdRetrieval, viewsets.ReadOnlyModelViewSet):
     pass
 
 
@@ -224,7 +438,9 @@ class LocationResource(PokeapiCommonViewset):
     list_serializer_class = LocationSummarySerializer
 
 
-class LocationAreaResource(ListOrDetailSerialRelation, viewsets.ReadOnlyModelViewSet):
+class LocationAreaResource(GenerationETags, SnapshotRetrieval, ListOrDetailSerialRelation,
+                           PlannedPrefetching, SparseFieldsets, LanguageFiltering,
+                           viewsets.ReadOnlyModelViewSet):
 
     queryset = LocationArea.objects.all()
     serializer_class = LocationAreaDetailSerializer
@@ -349,6 +565,12 @@ class PokemonResource(PokeapiCommonViewset):
     serializer_class = PokemonDetailSerializer
     list_serializer_class = PokemonSummarySerializer
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['version_group_id'] = requested_reference(
+            self.request.query_params, VERSION_GROUP_PARAM, VersionGroup)
+        return context
+
 
 class PokemonSpeciesResource(PokeapiCommonViewset):
 
@@ -399,7 +621,7 @@ class VersionGroupResource(PokeapiCommonViewset):
     list_serializer_class = VersionGroupSummarySerializer
 
 
-class PokemonEncounterView(APIView):
+class PokemonEncounterView(GenerationETags, APIView):
     """
     Handles Pokemon Encounters as a sub-resource.
     """
@@ -413,69 +635,212 @@ class PokemonEncounterView(APIView):
         except Pokemon.DoesNotExist:
             raise Http404
 
-        encounter_objects = Encounter.objects.filter(pokemon=pokemon)
+        # All of the pokemon's encounters come back in one query, sorted the way
+        # they are nested in the response, so the structure is built in one pass.
+
+        encounter_objects = (Encounter.objects
+                             .filter(pokemon=pokemon)
+                             .select_related(
+                                 'location_area', 'version',
+                                 'encounter_slot__encounter_method')
+                             .order_by(
+                                 'location_area_id', 'version_id',
+                                 'encounter_slot_id', 'id'))
+
+        condition_value_objects = (EncounterConditionValueMap.objects
+                                   .filter(encounter__pokemon=pokemon)
+                                   .select_related('encounter_condition_value')
+                                   .order_by('id'))
+
+        # Summaries are serialized once per object no matter how many
+        # encounters refer to them
+        summaries = {}
+
+        def summary(serializer_class, obj):
+            key = (serializer_class, obj.pk)
+            if key not in summaries:
+                summaries[key] = serializer_class(obj, context=self.context).data
+            return summaries[key]
+
+        condition_values = {}
+
+        for value_map in condition_value_objects:
+            condition_values.setdefault(value_map.encounter_id, []).append(
+                summary(
+                    EncounterConditionValueSummarySerializer,
+                    value_map.encounter_condition_value))
 
-        area_ids = (encounter_objects
-                    .order_by('location_area')
-                    .distinct('location_area')
-                    .values_list('location_area', flat=True))
+        encounters_list = []
+        area_id = version_id = None
+
+        for encounter in encounter_objects:
+
+            if encounter.location_area_id != area_id:
+                area_id = encounter.location_area_id
+                version_id = None
+                version_details_list = []
+                encounters_list.append({
+                    'location_area': summary(
+                        LocationAreaSummarySerializer, encounter.location_area),
+                    'version_details': version_details_list
+                })
 
-        location_area_objects = LocationArea.objects.filter(pk__in=area_ids)
-        version_objects = Version.objects
+            if encounter.version_id != version_id:
+                version_id = encounter.version_id
+                version_details = {
+                    'version': summary(VersionSummarySerializer, encounter.version),
+                    'max_chance': 0,
+                    'encounter_details': []
+                }
+                version_details_list.append(version_details)
 
-        encounters_list = []
+            slot = encounter.encounter_slot
 
-        for area_id in area_ids:
+            encounter_detail = OrderedDict()
+            encounter_detail['min_level'] = encounter.min_level
+            encounter_detail['max_level'] = encounter.max_level
+            encounter_detail['condition_values'] = condition_values.get(encounter.pk, [])
+            encounter_detail['chance'] = slot.rarity
+            encounter_detail['method'] = summary(
+                EncounterMethodSummarySerializer, slot.encounter_method)
 
-            location_area = location_area_objects.get(pk=area_id)
+            version_details['max_chance'] += slot.rarity
+            version_details['encounter_details'].append(encounter_detail)
 
-            area_encounters = encounter_objects.filter(location_area_id=area_id)
+        return Response(encounters_list)
 
-            version_ids = (area_encounters
-                           .order_by('version_id')
-                           .distinct('version_id')
-                           .values_list('version_id', flat=True))
 
-            version_details_list = []
+class PokemonMoveView(GenerationETags, generics.GenericAPIView):
+    """
+    Handles the moves of a Pokemon as a paginated sub-resource,
+    optionally for one version group (?version_group=).
+    """
 
-            for version_id in version_ids:
+    def get(self, request, pokemon_id):
 
-                version = version_objects.get(pk=version_id)
+        self.context = dict(request=request)
 
-                version_encounters = (area_encounters
-                                      .filter(version_id=version_id)
-                                      .order_by('encounter_slot_id'))
+        if not Pokemon.objects.filter(pk=pokemon_id).exists():
+            raise Http404
 
-                encounters_data = EncounterDetailSerializer(
-                    version_encounters, many=True, context=self.context).data
+        pokemon_moves = PokemonMove.objects.filter(pokemon_id=pokemon_id)
+        version_group_id = requested_reference(
+            request.query_params, VERSION_GROUP_PARAM, VersionGroup)
 
-                max_chance = 0
-                encounter_details_list = []
+        if version_group_id is not None:
+            pokemon_moves = pokemon_moves.filter(version_group_id=version_group_id)
 
-                for encounter in encounters_data:
-                    slot = EncounterSlot.objects.get(pk=encounter['encounter_slot'])
-                    slot_data = EncounterSlotSerializer(slot, context=self.context).data
+        # Pages are made of moves, only the entries of the moves
+        # on the page are loaded
+        move_ids = self.paginate_queryset(
+            pokemon_moves.order_by('move_id').values_list('move_id', flat=True).distinct())
 
-                    del encounter['pokemon']
-                    del encounter['encounter_slot']
-                    del encounter['location_area']
-                    del encounter['version']
-                    encounter['chance'] = slot_data['chance']
-                    max_chance += slot_data['chance']
-                    encounter['method'] = slot_data['encounter_method']
+        return self.get_paginated_response(summarize_pokemon_moves(
+            pokemon_moves.filter(move_id__in=move_ids), self.context))
 
-                    encounter_details_list.append(encounter)
 
-                version_details_list.append({
-                    'version': VersionSummarySerializer(version, context=self.context).data,
-                    'max_chance': max_chance,
-                    'encounter_details': encounter_details_list
-                })
+class PokemonSpeciesEvolutionChainView(GenerationETags, APIView):
+    """
+    Handles the evolution chain of a Pokemon species as a sub-resource.
+    The chain is found through the species to chain index, without
+    loading the species.
+    """
 
-            encounters_list.append({
-                'location_area': LocationAreaSummarySerializer(
-                    location_area, context=self.context).data,
-                'version_details': version_details_list
-            })
+    def get(self, request, pokemon_species_id):
 
-        return Response(encounters_list)
+        evolution_chain_id = species_evolution_chains().get(int(pokemon_species_id))
+
+        if evolution_chain_id is None:
+            raise Http404
+
+        evolution_chain = get_object_or_404(EvolutionChain, pk=evolution_chain_id)
+
+        return Response(EvolutionChainDetailSerializer(
+            evolution_chain, context=dict(request=request)).data)
+
+
+class TypeMatchupView(GenerationETags, APIView):
+    """
+    Scores any number of attacking types against single or dual defending
+    types at once, e.g. ?attacking=fire,water&defending=grass,grass/poison
+    Types can be given by id or name.
+    """
+
+    def get(self, request):
+
+        self.context = dict(request=request)
+        chart = type_chart()
+
+        def types(param, value):
+            type_ids = [chart.lookup(lookup) for lookup in value.split('/')]
+            if None in type_ids:
+                raise ValidationError({param: 'Unknown type in "{}".'.format(value)})
+            return type_ids
+
+        def values(param):
+            value = request.query_params.get(param, '')
+            if not value:
+                raise ValidationError({param: 'This parameter is required.'})
+            return value.split(',')
+
+        attacking = [types('attacking', value) for value in values('attacking')]
+        defending = [types('defending', value) for value in values('defending')]
+
+        if any(len(type_ids) != 1 for type_ids in attacking):
+            raise ValidationError({'attacking': 'Attacking types must be single types.'})
+
+        if any(len(type_ids) > 2 for type_ids in defending):
+            raise ValidationError({'defending': 'Defending types have at most two types.'})
+
+        def summary(type_id):
+            return TypeSummarySerializer(
+                Type(pk=type_id, name=chart.names[type_id]), context=self.context).data
+
+        attacking = [type_id for type_ids in attacking for type_id in type_ids]
+
+        matchups = OrderedDict()
+        matchups['attacking'] = [summary(type_id) for type_id in attacking]
+        matchups['defending'] = [
+            [summary(type_id) for type_id in type_ids] for type_ids in defending]
+        matchups['damage_factors'] = chart.matchups(attacking, defending)
+
+        return Response(matchups)
+
+
+class QueryPlanView(APIView):
+    """
+    Shows the select_related and prefetch_related plans of the list and
+    detail serializers of a resource (see prefetch.py), with DEBUG on.
+    """
+
+    # {resource: viewset}, given by urls.py
+    viewsets = None
+
+    def get(self, request, resource):
+
+        if not settings.DEBUG or resource not in self.viewsets:
+            raise Http404
+
+        viewset = self.viewsets[resource]
+
+        plans = OrderedDict()
+        plans['resource'] = resource
+        plans['list'] = query_plan(
+            viewset.list_serializer_class or viewset.serializer_class).describe()
+        plans['detail'] = query_plan(viewset.serializer_class).describe()
+
+        return Response(plans)
+
+
+class ResponseCacheStatsView(APIView):
+    """
+    Shows the response cache counters of the worker answering (see response_cache.py),
+    with DEBUG on.
+    """
+
+    def get(self, request):
+
+        if not settings.DEBUG:
+            raise Http404
+
+        return Response(response_cache_stats())
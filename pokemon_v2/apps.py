@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+from django.conf import settings
+
+from .query_cache import install_query_cache
+
+
+class PokemonV2Config(AppConfig):
+    name = 'pokemon_v2'
+
+    def ready(self):
+        if settings.FROZEN_DATA:
+            install_query_cache()
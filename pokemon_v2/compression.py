@@ -0,0 +1,214 @@
+import os
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django_redis.client import DefaultClient
+from django_redis.compressors.base import BaseCompressor
+from django_redis.exceptions import CompressorError
+
+from .generation import current_generation
+from .snapshot import snapshot_samples
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Compressors for django_redis, picked with the COMPRESSOR option of a cache.
+# ZstdCompressor needs the zstandard package. When it's installed the build
+# trains a dictionary on a sample of the rendered responses of each generation
+# (see data.v2.build), which lets zstd share the JSON keys and URLs repeated
+# across documents instead of finding them again in every one of them.
+#
+# Values compressed with a dictionary name it in their frame header, so they
+# can be read back after later builds. Dictionaries are kept in
+# <BUILD_ARTIFACTS_DIR>/dictionaries/<generation>.dict for the last
+# KEPT_DICTIONARIES generations, since cache entries (cachalot's) may outlive
+# several builds. Values naming a dictionary which isn't there (pruned, or never
+# copied to this host) can't be decompressed: CompressedClient, the client to
+# use along with ZstdCompressor, reads them as misses.
+
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# Size of the trained dictionaries, and how many documents of each resource they're trained on
+DICTIONARY_SIZE = 112 * 1024
+DICTIONARY_SAMPLES = 200
+
+KEPT_DICTIONARIES = 10
+
+# Decoded in place of values CompressedClient can't read
+UNREADABLE = object()
+
+
+class UnknownDictionary(Exception):
+    pass
+
+
+def dictionary_root():
+    return os.path.join(settings.BUILD_ARTIFACTS_DIR, 'dictionaries')
+
+
+def dictionary_path(generation):
+    return os.path.join(dictionary_root(), '{}.dict'.format(generation))
+
+
+def train_dictionary(generation, snapshot_dir):
+    """
+    Trains the zstd dictionary of a build generation on the documents of its
+    snapshot directory, served from BASE_URL as the cached responses are, and
+    returns its size. Returns None if zstandard
+    isn't installed or the snapshot has too few documents to train on.
+    """
+
+    if zstandard is None:
+        return None
+
+    try:
+        dictionary = zstandard.train_dictionary(
+            DICTIONARY_SIZE, snapshot_samples(snapshot_dir, DICTIONARY_SAMPLES, settings.BASE_URL))
+    except zstandard.ZstdError:
+        return None
+
+    os.makedirs(dictionary_root(), exist_ok=True)
+
+    path = dictionary_path(generation)
+    temp_path = '{}.{}'.format(path, os.getpid())
+    with open(temp_path, 'wb') as dictionary_file:
+        dictionary_file.write(dictionary.as_bytes())
+    os.replace(temp_path, path)
+
+    prune_dictionaries(generation)
+
+    return len(dictionary.as_bytes())
+
+
+def prune_dictionaries(generation):
+    """
+    Deletes the dictionaries of generations older than the last KEPT_DICTIONARIES.
+    """
+
+    for name in os.listdir(dictionary_root()):
+        stem, extension = os.path.splitext(name)
+        if extension == '.dict' and stem.isdigit() and int(stem) <= generation - KEPT_DICTIONARIES:
+            os.remove(os.path.join(dictionary_root(), name))
+
+
+def load_dictionary(path):
+    with open(path, 'rb') as dictionary_file:
+        return zstandard.ZstdCompressionDict(dictionary_file.read())
+
+
+class ZstdCompressor(BaseCompressor):
+    """
+    Compresses values with zstd, using the dictionary of the current build
+    generation if it has one. Takes the COMPRESS_LEVEL option.
+    """
+
+    min_length = 256
+    level = 3
+
+    def __init__(self, options):
+
+        if zstandard is None:
+            raise ImproperlyConfigured('ZstdCompressor requires the zstandard package.')
+
+        super().__init__(options)
+        self.level = options.get('COMPRESS_LEVEL', self.level)
+        self.generation = None
+        self.compressor = None
+
+        # Decompressors by dictionary id, 0 for no dictionary
+        self.decompressors = {0: zstandard.ZstdDecompressor()}
+
+        # The dictionary files loaded, and the mtime of their directory when last listed
+        self.loaded = set()
+        self.scanned = None
+
+    def get_compressor(self):
+
+        generation = current_generation()
+
+        if self.compressor is None or generation != self.generation:
+
+            path = dictionary_path(generation)
+            dictionary = load_dictionary(path) if os.path.exists(path) else None
+
+            self.compressor = zstandard.ZstdCompressor(level=self.level, dict_data=dictionary)
+            self.generation = generation
+
+        return self.compressor
+
+    def get_decompressor(self, dictionary_id):
+
+        if dictionary_id not in self.decompressors:
+            self.scan_dictionaries()
+
+        if dictionary_id not in self.decompressors:
+            raise UnknownDictionary('Unknown zstd dictionary {}.'.format(dictionary_id))
+
+        return self.decompressors[dictionary_id]
+
+    def scan_dictionaries(self):
+        """
+        Loads the dictionaries added since the directory was last listed, which
+        it is again only once its mtime changed.
+        """
+
+        root = dictionary_root()
+
+        try:
+            mtime = os.stat(root).st_mtime_ns
+        except OSError:
+            return
+
+        if (root, mtime) == self.scanned:
+            return
+
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if name.endswith('.dict') and path not in self.loaded:
+                dictionary = load_dictionary(path)
+                self.decompressors.setdefault(
+                    dictionary.dict_id(), zstandard.ZstdDecompressor(dict_data=dictionary))
+                self.loaded.add(path)
+
+        self.scanned = (root, mtime)
+
+    def compress(self, value):
+
+        if len(value) <= self.min_length:
+            return value
+
+        return self.get_compressor().compress(value)
+
+    def decompress(self, value):
+
+        # Values too short to be compressed are stored as they are
+        if not value.startswith(ZSTD_MAGIC):
+            raise CompressorError('Not a zstd frame.')
+
+        try:
+            parameters = zstandard.get_frame_parameters(value)
+            return self.get_decompressor(parameters.dict_id).decompress(value)
+        except zstandard.ZstdError as error:
+            raise CompressorError(error)
+
+
+class CompressedClient(DefaultClient):
+    """
+    django_redis client reading the values it can't decompress as misses.
+    """
+
+    def decode(self, value):
+        try:
+            return super().decode(value)
+        except UnknownDictionary:
+            return UNREADABLE
+
+    def get(self, key, default=None, version=None, client=None):
+        value = super().get(key, default=default, version=version, client=client)
+        return default if value is UNREADABLE else value
+
+    def get_many(self, keys, version=None, client=None):
+        values = super().get_many(keys, version=version, client=client)
+        return type(values)(
+            (key, value) for key, value in values.items() if value is not UNREADABLE)
@@ -0,0 +1,127 @@
+import json
+
+from .models import (
+    Encounter, EncounterConditionValueMap, LocationArea, LocationAreaEncounterRate,
+    LocationAreaEncounterSummary)
+
+# The encounters of a location area are aggregated into the nested structure of
+# LocationAreaDetailSerializer once, by the build, and stored as
+# LocationAreaEncounterSummary rows. Related resources are kept as [id, name]
+# pairs so the stored summaries don't depend on the host they're served from.
+
+
+def summarize_location_area_encounters(location_area_ids=None):
+    """
+    Returns {location_area_id: (encounter_method_rates, pokemon_encounters)}
+    for the given location areas, or for all of them, in three queries.
+    """
+
+    encounter_rates = LocationAreaEncounterRate.objects.all()
+    encounters = Encounter.objects.all()
+    condition_value_maps = EncounterConditionValueMap.objects.all()
+
+    if location_area_ids is not None:
+        encounter_rates = encounter_rates.filter(location_area_id__in=location_area_ids)
+        encounters = encounters.filter(location_area_id__in=location_area_ids)
+        condition_value_maps = condition_value_maps.filter(
+            encounter__location_area_id__in=location_area_ids)
+
+    encounter_rates = (encounter_rates
+                       .order_by('location_area_id', 'encounter_method_id', 'id')
+                       .values_list(
+                           'location_area_id', 'encounter_method_id', 'encounter_method__name',
+                           'version_id', 'version__name', 'rate'))
+
+    condition_value_maps = (condition_value_maps
+                            .order_by('id')
+                            .values_list(
+                                'encounter_id', 'encounter_condition_value_id',
+                                'encounter_condition_value__name'))
+
+    encounters = (encounters
+                  .order_by('location_area_id', 'pokemon_id', 'version_id', 'id')
+                  .values_list(
+                      'id', 'location_area_id', 'pokemon_id', 'pokemon__name',
+                      'version_id', 'version__name', 'min_level', 'max_level',
+                      'encounter_slot__rarity', 'encounter_slot__encounter_method_id',
+                      'encounter_slot__encounter_method__name'))
+
+    summaries = {}
+
+    def area_summary(location_area_id):
+        if location_area_id not in summaries:
+            summaries[location_area_id] = ([], [])
+        return summaries[location_area_id]
+
+    # Rows are sorted the way they are nested, so a group ends when its key changes
+
+    method_key = None
+
+    for (location_area_id, method_id, method_name,
+         version_id, version_name, rate) in encounter_rates:
+
+        if (location_area_id, method_id) != method_key:
+            method_key = (location_area_id, method_id)
+            method_rates = {'encounter_method': [method_id, method_name], 'version_details': []}
+            area_summary(location_area_id)[0].append(method_rates)
+
+        method_rates['version_details'].append({
+            'rate': rate,
+            'version': [version_id, version_name]
+        })
+
+    condition_values = {}
+
+    for encounter_id, value_id, value_name in condition_value_maps:
+        condition_values.setdefault(encounter_id, []).append([value_id, value_name])
+
+    pokemon_key = version_key = None
+
+    for (encounter_id, location_area_id, pokemon_id, pokemon_name, version_id, version_name,
+         min_level, max_level, chance, method_id, method_name) in encounters:
+
+        if (location_area_id, pokemon_id) != pokemon_key:
+            pokemon_key = (location_area_id, pokemon_id)
+            pokemon_details = {'pokemon': [pokemon_id, pokemon_name], 'version_details': []}
+            area_summary(location_area_id)[1].append(pokemon_details)
+
+        if pokemon_key + (version_id,) != version_key:
+            version_key = pokemon_key + (version_id,)
+            version_details = {
+                'version': [version_id, version_name],
+                'max_chance': 0,
+                'encounter_details': []
+            }
+            pokemon_details['version_details'].append(version_details)
+
+        version_details['max_chance'] += chance
+        version_details['encounter_details'].append({
+            'min_level': min_level,
+            'max_level': max_level,
+            'condition_values': condition_values.get(encounter_id, []),
+            'chance': chance,
+            'method': [method_id, method_name]
+        })
+
+    return summaries
+
+
+def location_area_encounter_summaries(location_area_ids=None):
+    """
+    Yields unsaved LocationAreaEncounterSummary objects for the given
+    location areas, or for all of them.
+    """
+
+    summaries = summarize_location_area_encounters(location_area_ids)
+
+    # Areas without encounters get a summary too, so none has to be aggregated later
+    if location_area_ids is None:
+        location_area_ids = LocationArea.objects.order_by('id').values_list('id', flat=True)
+
+    for location_area_id in location_area_ids:
+        encounter_method_rates, pokemon_encounters = summaries.get(location_area_id, ([], []))
+        yield LocationAreaEncounterSummary(
+            location_area_id=location_area_id,
+            encounter_method_rates=json.dumps(encounter_method_rates),
+            pokemon_encounters=json.dumps(pokemon_encounters)
+        )
@@ -0,0 +1,153 @@
+import json
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .generation import current_generation
+from .models import EvolutionChain, EvolutionChainSummary, PokemonEvolution, PokemonSpecies
+
+# The evolution tree of each chain is put together once, by the build, in the
+# nested structure of EvolutionChainDetailSerializer and stored as an
+# EvolutionChainSummary row. Like the encounter summaries (see encounters.py)
+# related resources are kept as [id, name] pairs.
+
+# The fields of PokemonEvolutionSerializer, with the model field they come from
+# and, for relations, the model field holding the name of the related resource
+EVOLUTION_DETAIL_FIELDS = (
+    ('item', 'evolution_item', 'evolution_item__name'),
+    ('trigger', 'evolution_trigger', 'evolution_trigger__name'),
+    ('gender', 'gender', None),
+    ('held_item', 'held_item', 'held_item__name'),
+    ('known_move', 'known_move', 'known_move__name'),
+    ('known_move_type', 'known_move_type', 'known_move_type__name'),
+    ('location', 'location', 'location__name'),
+    ('min_level', 'min_level', None),
+    ('min_happiness', 'min_happiness', None),
+    ('min_beauty', 'min_beauty', None),
+    ('min_affection', 'min_affection', None),
+    ('needs_overworld_rain', 'needs_overworld_rain', None),
+    ('party_species', 'party_species', 'party_species__name'),
+    ('party_type', 'party_type', 'party_type__name'),
+    ('relative_physical_stats', 'relative_physical_stats', None),
+    ('time_of_day', 'time_of_day', None),
+    ('trade_species', 'trade_species', 'trade_species__name'),
+    ('turn_upside_down', 'turn_upside_down', None),
+)
+
+_species_chains = {'generation': None, 'chains': None}
+
+
+def summarize_evolution_chains(evolution_chain_ids=None):
+    """
+    Returns {evolution_chain_id: chain} for the given evolution chains,
+    or for all of them, in two queries.
+    """
+
+    species = PokemonSpecies.objects.all()
+    evolutions = PokemonEvolution.objects.filter(evolved_species__isnull=False)
+
+    if evolution_chain_ids is not None:
+        species = species.filter(evolution_chain_id__in=evolution_chain_ids)
+        evolutions = evolutions.filter(
+            evolved_species__evolution_chain_id__in=evolution_chain_ids)
+
+    species = (species
+               .filter(evolution_chain__isnull=False)
+               .order_by('evolution_chain_id', 'order')
+               .values_list(
+                   'evolution_chain_id', 'id', 'name', 'evolves_from_species_id', 'is_baby'))
+
+    columns = ['evolved_species_id']
+    for field, model_field, name_field in EVOLUTION_DETAIL_FIELDS:
+        columns.append(model_field + '_id' if name_field else model_field)
+        if name_field:
+            columns.append(name_field)
+
+    evolution_details = {}
+
+    for row in evolutions.order_by('id').values_list(*columns):
+        values = iter(row[1:])
+        details = {}
+        for field, model_field, name_field in EVOLUTION_DETAIL_FIELDS:
+            value = next(values)
+            if name_field:
+                name = next(values)
+                value = [value, name] if value is not None else None
+            details[field] = value
+        evolution_details.setdefault(row[0], []).append(details)
+
+    chains = {}
+    chain_id = None
+
+    # Species are sorted by chain and then by order, which puts every species
+    # right after the one it evolves from or after its siblings
+
+    for (evolution_chain_id, species_id, species_name,
+         evolves_from_species_id, is_baby) in species:
+
+        if evolution_chain_id != chain_id:
+            chain_id = evolution_chain_id
+            chains[chain_id] = entry = {}
+            current_evolutions = None
+            details = None
+            previous_entry = None
+            previous_species_id = None
+
+        if evolves_from_species_id:
+
+            # In case this species is one of several evolutions of a species
+            if previous_species_id == evolves_from_species_id:
+                current_evolutions = previous_entry['evolves_to']
+
+            entry = {}
+            details = evolution_details.get(species_id, [])
+            current_evolutions.append(entry)
+
+        entry['is_baby'] = is_baby
+        entry['species'] = [species_id, species_name]
+        entry['evolution_details'] = details or []
+        entry['evolves_to'] = []
+
+        previous_entry = entry
+        previous_species_id = species_id
+
+    return chains
+
+
+def evolution_chain_summaries(evolution_chain_ids=None):
+    """
+    Yields unsaved EvolutionChainSummary objects for the given
+    evolution chains, or for all of them.
+    """
+
+    chains = summarize_evolution_chains(evolution_chain_ids)
+
+    if evolution_chain_ids is None:
+        evolution_chain_ids = EvolutionChain.objects.order_by('id').values_list('id', flat=True)
+
+    for evolution_chain_id in evolution_chain_ids:
+        yield EvolutionChainSummary(
+            evolution_chain_id=evolution_chain_id,
+            chain=json.dumps(chains.get(evolution_chain_id, {}))
+        )
+
+
+def species_evolution_chains():
+    """
+    Returns {pokemon_species_id: evolution_chain_id}, loaded once
+    per process and build generation.
+    """
+
+    generation = current_generation()
+
+    if _species_chains['chains'] is None or _species_chains['generation'] != generation:
+        _species_chains['chains'] = dict(
+            PokemonSpecies.objects.values_list('id', 'evolution_chain_id'))
+        _species_chains['generation'] = generation
+
+    return _species_chains['chains']
+
+
+@receiver(post_save, sender=PokemonSpecies)
+@receiver(post_delete, sender=PokemonSpecies)
+def clear_species_evolution_chains(**kwargs):
+    _species_chains['chains'] = None
@@ -0,0 +1,155 @@
+from collections import OrderedDict
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+# Sparse fieldsets let clients ask for part of a resource, with ?fields= listing
+# the fields to keep and ?exclude= the fields to drop, as comma separated paths
+# which may reach into nested fields with dots (e.g. ?fields=stats.base_stat,types).
+#
+# The fields left out are removed from the serializer before it runs, so their
+# queries are never made. Fields computed by a SerializerMethodField can't be
+# pruned before they run, the paths reaching into them filter their output.
+
+FIELDS_PARAM = 'fields'
+EXCLUDE_PARAM = 'exclude'
+
+
+class Fieldsets():
+
+    def __init__(self, fields=None, exclude=None):
+        """
+        fields and exclude are lists of dotted paths, or None.
+        """
+
+        self.fields = parse_paths(fields) if fields is not None else None
+        self.exclude = parse_paths(exclude) if exclude is not None else None
+
+        # Identifies the field set, for caches
+        self.key = (
+            tuple(sorted(fields)) if fields is not None else None,
+            tuple(sorted(exclude)) if exclude is not None else None)
+
+
+def parse_paths(paths):
+    """
+    Returns the tree of a list of dotted paths, where None stands for a
+    whole field, e.g. ['stats.stat', 'types'] gives {'stats': {'stat': None}, 'types': None}
+    """
+
+    tree = {}
+
+    for path in paths:
+        node = tree
+        names = path.split('.')
+
+        for name in names[:-1]:
+            if name in node and node[name] is None:
+                break
+            node = node.setdefault(name, {})
+        else:
+            node[names[-1]] = None
+
+    return tree
+
+
+def requested_fieldsets(query_params):
+    """
+    Returns the Fieldsets of a request, or None if it asks for every field.
+    """
+
+    def paths(param):
+        if param not in query_params:
+            return None
+        return [path for path in query_params[param].split(',') if path]
+
+    fields = paths(FIELDS_PARAM)
+    exclude = paths(EXCLUDE_PARAM)
+
+    if fields is None and exclude is None:
+        return None
+
+    return Fieldsets(fields, exclude)
+
+
+def filter_data(data, fields, exclude):
+    """
+    Applies fieldset trees to serialized data, for fields which aren't serializers.
+    """
+
+    if isinstance(data, list):
+        return [filter_data(item, fields, exclude) for item in data]
+
+    if not isinstance(data, dict):
+        return data
+
+    filtered = OrderedDict()
+
+    for name, value in data.items():
+
+        subfields = fields.get(name) if fields is not None else None
+        subexclude = exclude.get(name) if exclude is not None else None
+
+        if fields is not None and name not in fields:
+            continue
+        if exclude is not None and name in exclude and subexclude is None:
+            continue
+
+        if subfields is not None or subexclude is not None:
+            value = filter_data(value, subfields, subexclude)
+
+        filtered[name] = value
+
+    return filtered
+
+
+class FilteredField(serializers.Field):
+    """
+    Wraps a field which isn't a serializer to apply fieldset trees to its output.
+    """
+
+    def __init__(self, field, fields, exclude):
+        self.field = field
+        self.subfields = fields
+        self.subexclude = exclude
+        super().__init__(read_only=True)
+
+    def get_attribute(self, instance):
+        return self.field.get_attribute(instance)
+
+    def to_representation(self, value):
+        return filter_data(self.field.to_representation(value), self.subfields, self.subexclude)
+
+
+def prune_fields(serializer, fields, exclude, path=''):
+    """
+    Removes the fields left out by fieldset trees from a serializer and its
+    nested serializers. Raises a ValidationError for unknown field names.
+    """
+
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+
+    for param, tree in ((FIELDS_PARAM, fields), (EXCLUDE_PARAM, exclude)):
+        unknown = [name for name in tree or () if name not in serializer.fields]
+        if unknown:
+            raise ValidationError({param: 'Unknown field "{}".'.format(path + unknown[0])})
+
+    for name, field in list(serializer.fields.items()):
+
+        subfields = fields.get(name) if fields is not None else None
+        subexclude = exclude.get(name) if exclude is not None else None
+
+        if ((fields is not None and name not in fields) or
+                (exclude is not None and name in exclude and subexclude is None)):
+            del serializer.fields[name]
+
+        elif subfields is None and subexclude is None:
+            continue
+
+        elif isinstance(field, serializers.BaseSerializer):
+            prune_fields(field, subfields, subexclude, path + name + '.')
+
+        else:
+            serializer.fields[name] = FilteredField(field, subfields, subexclude)
+
+    return serializer
@@ -0,0 +1,85 @@
+import hashlib
+import os
+from urllib.parse import parse_qsl, urlencode
+from django.conf import settings
+
+# The build generation is a counter bumped by data.v2.build.build_all() each
+# time it finishes. Everything derived from the data (snapshots, caches) is
+# keyed by it, so publishing a new generation invalidates all of it at once.
+
+GENERATION_FILE = 'GENERATION'
+
+_marker = {'stamp': None, 'generation': 0}
+
+
+def generation_path():
+    return os.path.join(settings.BUILD_ARTIFACTS_DIR, GENERATION_FILE)
+
+
+def current_generation():
+    """
+    Returns the last published build generation, or 0 if there is none.
+    The marker file is only re-read when it has been replaced.
+    """
+
+    path = generation_path()
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return 0
+
+    stamp = (path, stat.st_ino, stat.st_mtime_ns)
+
+    if stamp != _marker['stamp']:
+        with open(path, 'rt') as marker:
+            _marker['generation'] = int(marker.read().strip() or 0)
+        _marker['stamp'] = stamp
+
+    return _marker['generation']
+
+
+def publish_generation(generation):
+    """
+    Atomically replaces the marker file so readers in other processes
+    never see a half written generation.
+    """
+
+    path = generation_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    temp_path = '{}.{}'.format(path, os.getpid())
+    with open(temp_path, 'wt') as marker:
+        marker.write(str(generation))
+    os.replace(temp_path, path)
+
+    return generation
+
+
+def normalized_url(request):
+    """
+    Returns the absolute URL of a request with its query params sorted by name,
+    so the same params in another order give the same URL.
+    """
+
+    params = sorted(parse_qsl(request.META.get('QUERY_STRING', ''), keep_blank_values=True),
+                    key=lambda param: param[0])
+    url = '{}://{}{}'.format(request.scheme, request.get_host(), request.path)
+
+    return url + '?' + urlencode(params) if params else url
+
+
+def generation_etag(request):
+    """
+    Returns a strong ETag for a request, made of the build generation and its
+    normalized URL, or None if no generation has been published.
+    """
+
+    generation = current_generation()
+
+    if not generation:
+        return None
+
+    url = hashlib.sha1(normalized_url(request).encode('utf-8')).hexdigest()
+
+    return '"{}-{}"'.format(generation, url[:20])
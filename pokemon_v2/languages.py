@@ -0,0 +1,28 @@
+from .models import Language
+from .registry import requested_reference
+
+# ?lang= narrows the localized entries of a resource (names, flavor texts,
+# effect texts, genera, ...) down to one language, given by name or id. The
+# filter is part of the queries fetching them: the prefetches made by the
+# planner (see prefetch.py) and the querysets of SerializerMethodFields.
+
+LANGUAGE_PARAM = 'lang'
+
+
+def requested_language(query_params):
+    """
+    Returns the id of the language asked for, or None for every language.
+    """
+
+    return requested_reference(query_params, LANGUAGE_PARAM, Language)
+
+
+def in_language(queryset, language_id, field='language'):
+    """
+    Narrows a queryset of localized rows down to one language, if one was asked for.
+    """
+
+    if language_id is None:
+        return queryset
+
+    return queryset.filter(**{field + '_id': language_id})
@@ -0,0 +1,26 @@
+# Generated by Django 2.1.15 on 2026-10-18 17:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pokemon_v2', '0003_auto_20160530_1132'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationAreaEncounterSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('encounter_method_rates', models.TextField()),
+                ('pokemon_encounters', models.TextField()),
+                ('location_area', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='locationareaencountersummary', to='pokemon_v2.LocationArea')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
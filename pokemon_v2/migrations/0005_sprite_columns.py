@@ -0,0 +1,129 @@
+# Generated by Django 2.1.15 on 2026-10-18 18:08
+
+import json
+
+from django.db import migrations, models
+
+# The keys of the old JSON sprites, in the order they were written
+SPRITE_FIELDS = {
+    'ItemSprites': ('default',),
+    'PokemonFormSprites': ('front_default', 'front_shiny', 'back_default', 'back_shiny'),
+    'PokemonSprites': (
+        'front_default', 'front_female', 'front_shiny', 'front_shiny_female',
+        'back_default', 'back_female', 'back_shiny', 'back_shiny_female'),
+}
+
+
+def media_path_to_path(media_path):
+    # '/media/sprites/pokemon/1.png' becomes 'pokemon/1.png'
+    return media_path.replace('/media/sprites/', '', 1) if media_path else None
+
+
+def split_sprites(apps, schema_editor):
+    for model_name, fields in SPRITE_FIELDS.items():
+        model = apps.get_model('pokemon_v2', model_name)
+        for sprites in model.objects.all():
+            sprites_data = json.loads(sprites.sprites)
+            for field in fields:
+                setattr(sprites, field, media_path_to_path(sprites_data.get(field)))
+            sprites.save()
+
+
+def join_sprites(apps, schema_editor):
+    for model_name, fields in SPRITE_FIELDS.items():
+        model = apps.get_model('pokemon_v2', model_name)
+        for sprites in model.objects.all():
+            sprites.sprites = json.dumps({
+                field: '/media/sprites/' + getattr(sprites, field)
+                if getattr(sprites, field) else None
+                for field in fields
+            })
+            sprites.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pokemon_v2', '0004_locationareaencountersummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemsprites',
+            name='default',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='pokemonformsprites',
+            name='back_default',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='pokemonformsprites',
+            name='back_shiny',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='pokemonformsprites',
+            name='front_default',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='pokemonformsprites',
+            name='front_shiny',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='pokemonsprites',
+            name='back_default',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='pokemonsprites',
+            name='back_female',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='pokemonsprites',
+            name='back_shiny',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='pokemonsprites',
+            name='back_shiny_female',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='pokemonsprites',
+            name='front_default',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='pokemonsprites',
+            name='front_female',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='pokemonsprites',
+            name='front_shiny',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='pokemonsprites',
+            name='front_shiny_female',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.RunPython(split_sprites, join_sprites),
+        migrations.RemoveField(
+            model_name='itemsprites',
+            name='sprites',
+        ),
+        migrations.RemoveField(
+            model_name='pokemonformsprites',
+            name='sprites',
+        ),
+        migrations.RemoveField(
+            model_name='pokemonsprites',
+            name='sprites',
+        ),
+    ]
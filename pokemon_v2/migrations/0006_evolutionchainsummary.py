@@ -0,0 +1,22 @@
+# Generated by Django 2.1.15 on 2026-10-18 18:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pokemon_v2', '0005_sprite_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EvolutionChainSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chain', models.TextField()),
+                ('evolution_chain', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='pokemon_v2.EvolutionChain')),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.1.15 on 2026-10-18 18:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pokemon_v2', '0006_evolutionchainsummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pokemonmove',
+            index=models.Index(fields=['pokemon', 'version_group'], name='pokemon_v2__pokemon_64103f_idx'),
+        ),
+    ]
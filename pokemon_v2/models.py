@@ -703,9 +703,12 @@ class ItemGameIndex(HasItem, HasGeneration, HasGameIndex):
     pass
 
 
+# Sprites are stored as paths relative to settings.SPRITES_URL, or null
+# where there is no image, and are resolved against it when serialized
+
 class ItemSprites(HasItem):
 
-    sprites = models.CharField(max_length=500)
+    default = models.CharField(max_length=100, blank=True, null=True)
 
 
 ####################
@@ -953,6 +956,15 @@ class EncounterConditionValueMap(models.Model):
         EncounterConditionValue, blank=True, null=True, on_delete=models.CASCADE)
 
 
+# Encounter method rates and pokemon encounters of a location area as JSON,
+# written by the build so location area details don't have to aggregate them
+class LocationAreaEncounterSummary(HasLocationArea):
+
+    encounter_method_rates = models.TextField()
+
+    pokemon_encounters = models.TextField()
+
+
 #################
 #  MOVE MODELS  #
 #################
@@ -1230,6 +1242,16 @@ class EvolutionChain(models.Model):
     baby_trigger_item = models.ForeignKey(Item, blank=True, null=True, on_delete=models.CASCADE)
 
 
+# The evolution tree of a chain as JSON, written by the build so evolution
+# chain details don't have to be put together from the species of the chain
+class EvolutionChainSummary(models.Model):
+
+    evolution_chain = models.ForeignKey(
+        EvolutionChain, blank=True, null=True, on_delete=models.CASCADE)
+
+    chain = models.TextField()
+
+
 class EvolutionTrigger(HasName):
     pass
 
@@ -1413,7 +1435,13 @@ class PokemonFormName(HasPokemonForm, IsName):
 
 class PokemonFormSprites(HasPokemonForm):
 
-    sprites = models.CharField(max_length=500)
+    front_default = models.CharField(max_length=100, blank=True, null=True)
+
+    front_shiny = models.CharField(max_length=100, blank=True, null=True)
+
+    back_default = models.CharField(max_length=100, blank=True, null=True)
+
+    back_shiny = models.CharField(max_length=100, blank=True, null=True)
 
 
 class PokemonGameIndex(HasPokemon, HasGameIndex, HasVersion):
@@ -1453,6 +1481,10 @@ class PokemonMove(HasPokemon, HasMoveLearnMethod, HasVersionGroup, HasMove, HasO
 
     level = models.IntegerField()
 
+    class Meta:
+        # Learnsets are read one pokemon and version group at a time
+        indexes = [models.Index(fields=['pokemon', 'version_group'])]
+
 
 class PokemonShape(HasName):
     pass
@@ -1482,4 +1514,18 @@ class PokemonType(HasPokemon, HasType):
 
 class PokemonSprites(HasPokemon):
 
-    sprites = models.CharField(max_length=500)
+    front_default = models.CharField(max_length=100, blank=True, null=True)
+
+    front_female = models.CharField(max_length=100, blank=True, null=True)
+
+    front_shiny = models.CharField(max_length=100, blank=True, null=True)
+
+    front_shiny_female = models.CharField(max_length=100, blank=True, null=True)
+
+    back_default = models.CharField(max_length=100, blank=True, null=True)
+
+    back_female = models.CharField(max_length=100, blank=True, null=True)
+
+    back_shiny = models.CharField(max_length=100, blank=True, null=True)
+
+    back_shiny_female = models.CharField(max_length=100, blank=True, null=True)
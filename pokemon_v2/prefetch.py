@@ -0,0 +1,152 @@
+from collections import OrderedDict
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+from .fieldsets import prune_fields
+from .languages import in_language
+from .serializers import LanguageSummarySerializer, ReferenceSummaryMixin
+
+# The prefetch planner works out, from the declared fields of a serializer, which
+# relations it is going to follow: nested serializers over a foreign key are
+# joined in with select_related, and nested serializers with many=True over a
+# reverse foreign key or many to many field are fetched with prefetch_related,
+# planning their own fields the same way. A plan is made once per serializer
+# class and applied to the queryset of every request using it.
+#
+# Relations read by SerializerMethodFields are left alone, those methods run
+# their own queries. So are the summaries served by the registry (see
+# registry.py), which only need the id of the related row. With sparse
+# fieldsets (see fieldsets.py) only the fields asked for are planned, and
+# with ?lang= (see languages.py) prefetched localized rows are filtered by
+# the foreign key behind their language field.
+
+# Field sets come from the query string, so only so many of their plans are kept
+MAX_PLANS = 256
+
+_plans = {}
+
+
+class QueryPlan():
+
+    def __init__(self, model):
+        self.model = model
+        self.select_related = []
+        self.prefetch_related = []
+        self.language_field = None
+
+    def apply(self, queryset, language_id=None):
+        """
+        Applies the plan to a queryset, keeping only the localized rows
+        in the given language among the prefetched ones.
+        """
+
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*(
+                Prefetch(lookup, queryset=plan.apply(plan.localized(language_id), language_id))
+                for lookup, plan in self.prefetch_related))
+
+        return queryset
+
+    def localized(self, language_id):
+
+        if self.language_field is None:
+            return self.model.objects.all()
+
+        return in_language(self.model.objects.all(), language_id, self.language_field)
+
+    def describe(self):
+        """
+        Returns the plan as {select_related, prefetch_related}, for the debug view.
+        """
+
+        return OrderedDict((
+            ('model', self.model.__name__),
+            ('language_field', self.language_field),
+            ('select_related', list(self.select_related)),
+            ('prefetch_related', OrderedDict(
+                (lookup, plan.describe()) for lookup, plan in self.prefetch_related)),
+        ))
+
+
+def get_relation(model, source):
+    """
+    Returns the relation of a model reached through an attribute, or None if
+    the attribute is not a relation (reverse relations are looked up by
+    accessor name, e.g. 'abilityname').
+    """
+
+    for field in model._meta.get_fields():
+        if field.is_relation:
+            name = field.get_accessor_name() if field.auto_created else field.name
+            if name == source:
+                return field
+
+    return None
+
+
+def plan_fields(plan, serializer, prefix=''):
+    """
+    Adds the relations followed by the fields of a serializer instance to a plan,
+    with prefix leading from the model of the plan to the model of the serializer.
+    """
+
+    model = serializer.Meta.model
+
+    # Declared rather than bound, a sparse fieldset may have left it out
+    language = type(serializer)._declared_fields.get('language')
+
+    if isinstance(language, LanguageSummarySerializer) and not prefix:
+        relation = get_relation(model, language.source or 'language')
+        if relation is not None and relation.many_to_one:
+            plan.language_field = relation.name
+
+    for field in serializer.fields.values():
+
+        source = field.source
+        many = isinstance(field, serializers.ListSerializer)
+        nested = field.child if many else field
+
+        if (not isinstance(nested, serializers.ModelSerializer) or
+                source == '*' or '.' in source or isinstance(nested, ReferenceSummaryMixin)):
+            continue
+
+        relation = get_relation(model, source)
+
+        if relation is None:
+            continue
+
+        if not many and (relation.many_to_one or relation.one_to_one):
+            plan.select_related.append(prefix + source)
+            plan_fields(plan, nested, prefix + source + '__')
+
+        elif many and (relation.one_to_many or relation.many_to_many):
+            related_plan = QueryPlan(relation.related_model)
+            plan_fields(related_plan, nested)
+            plan.prefetch_related.append((prefix + source, related_plan))
+
+
+def query_plan(serializer_class, fieldsets=None):
+    """
+    Returns the QueryPlan of a model serializer, for the given Fieldsets
+    or for all of its fields, made once per process.
+    """
+
+    key = (serializer_class, fieldsets.key if fieldsets is not None else None)
+
+    if key not in _plans:
+
+        if len(_plans) >= MAX_PLANS:
+            _plans.clear()
+
+        serializer = serializer_class()
+        if fieldsets is not None:
+            prune_fields(serializer, fieldsets.fields, fieldsets.exclude)
+
+        plan = QueryPlan(serializer_class.Meta.model)
+        plan_fields(plan, serializer)
+        _plans[key] = plan
+
+    return _plans[key]
@@ -0,0 +1,134 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import EmptyResultSet
+from django.db.models.sql.compiler import (
+    SQLCompiler, SQLDeleteCompiler, SQLInsertCompiler, SQLUpdateCompiler)
+from django.db.models.sql.constants import CURSOR, MULTI
+
+from .generation import current_generation
+
+# Between builds the data is read only, so with settings.FROZEN_DATA on the
+# results of ORM queries on the models of this app are cached by database, SQL,
+# params and build generation in the cache named by settings.QUERY_CACHE, one
+# lookup per query. The tables of the other apps (sessions, users...) change
+# between builds, their queries always go to the database.
+# This replaces the reads of cachalot, which look up and compare an
+# invalidation timestamp for every table a query touches.
+#
+# Publishing a new generation moves every key at once. build_all() goes to the
+# database directly, since it reads the tables it writes, and flushes the
+# previous generation's entries once it has published the new one.
+
+KEY_PREFIX = 'query'
+
+WRITE_COMPILERS = (SQLInsertCompiler, SQLUpdateCompiler, SQLDeleteCompiler)
+
+APP_LABEL = 'pokemon_v2'
+
+_installed = {'execute_sql': None}
+
+
+def query_cache():
+    return caches[settings.QUERY_CACHE]
+
+
+def query_key(compiler, result_type, generation):
+    """
+    Returns the cache key of the query of a compiler for a build generation.
+    Raises EmptyResultSet for queries which can't match anything.
+    """
+
+    sql, params = compiler.as_sql()
+    query = '{}:{}:{}:{}'.format(compiler.using, result_type, sql, [str(param) for param in params])
+
+    return '{}:{}:{}'.format(
+        KEY_PREFIX, generation, hashlib.sha1(query.encode('utf-8')).hexdigest())
+
+
+def is_cacheable(compiler, result_type):
+    """
+    Returns whether the results of the query of a compiler are kept: reads
+    of the build's models, fetched to the end.
+    """
+
+    model = compiler.query.model
+
+    return (
+        model is not None and model._meta.app_label == APP_LABEL and
+        result_type != CURSOR and not isinstance(compiler, WRITE_COMPILERS))
+
+
+def cached_execute_sql(execute_sql):
+    """
+    Wraps SQLCompiler.execute_sql to cache the results of read queries.
+    """
+
+    def inner(compiler, result_type=MULTI, *args, **kwargs):
+
+        generation = current_generation()
+
+        if not generation or not is_cacheable(compiler, result_type):
+            return execute_sql(compiler, result_type, *args, **kwargs)
+
+        try:
+            key = query_key(compiler, result_type, generation)
+        except EmptyResultSet:
+            return execute_sql(compiler, result_type, *args, **kwargs)
+
+        cache = query_cache()
+        entry = cache.get(key)
+
+        if entry is None:
+            result = execute_sql(compiler, result_type, *args, **kwargs)
+
+            # Results of many rows come as a generator of chunks
+            if result is not None and not isinstance(result, (list, tuple)):
+                result = list(result)
+
+            # Wrapped, a query without a result must not read as a miss
+            entry = (result,)
+            cache.set(key, entry, settings.QUERY_CACHE_TIMEOUT)
+
+        return entry[0]
+
+    inner.__wrapped__ = execute_sql
+
+    return inner
+
+
+def install_query_cache():
+    """
+    Routes the read queries of this process through the query cache, in place
+    of cachalot's reads when it is installed (its writes still invalidate).
+    """
+
+    if _installed['execute_sql'] is not None:
+        return
+
+    execute_sql = SQLCompiler.execute_sql
+    _installed['execute_sql'] = execute_sql
+
+    # cachalot keeps the method it wrapped as __wrapped__
+    SQLCompiler.execute_sql = cached_execute_sql(getattr(execute_sql, '__wrapped__', execute_sql))
+
+
+def uninstall_query_cache():
+
+    if _installed['execute_sql'] is None:
+        return
+
+    SQLCompiler.execute_sql = _installed['execute_sql']
+    _installed['execute_sql'] = None
+
+
+def flush_query_cache(generation):
+    """
+    Deletes the entries of a build generation, where the cache can find them by
+    pattern (django_redis). Elsewhere they are left to expire.
+    """
+
+    cache = query_cache()
+
+    if hasattr(cache, 'delete_pattern'):
+        cache.delete_pattern('{}:{}:*'.format(KEY_PREFIX, generation))
@@ -0,0 +1,102 @@
+from collections import OrderedDict
+from django.db.models.signals import post_delete, post_save
+from django.urls import reverse
+from rest_framework.exceptions import ValidationError
+
+from .generation import current_generation
+from .models import Language, Stat, Type, Version, VersionGroup
+
+# The registry holds small tables which only change when the data is rebuilt
+# (languages, versions, ...) in every process, so the summaries of their rows
+# can be rendered without a query or a reverse() per reference. Each table is
+# loaded once per build generation as {id: name}, and its {name, url} summaries
+# are built once per origin the API is served from. Saving or deleting a row
+# through the ORM in this process drops its table too.
+
+REFERENCE_MODELS = (Language, Stat, Type, Version, VersionGroup)
+
+# Origins come from the Host header, which only ALLOWED_HOSTS limits
+MAX_ORIGINS = 16
+
+_registry = {'generation': None, 'tables': {}, 'summaries': {}}
+
+
+def reference_table(model):
+    """
+    Returns {id: name} for every row of one of the REFERENCE_MODELS.
+    """
+
+    generation = current_generation()
+
+    if _registry['generation'] != generation:
+        clear_reference_tables()
+        _registry['generation'] = generation
+
+    tables = _registry['tables']
+
+    if model not in tables:
+        tables[model] = dict(model.objects.values_list('id', 'name'))
+
+    return tables[model]
+
+
+def reference_summaries(model, view_name, origin):
+    """
+    Returns {id: {name, url}} for every row of one of the REFERENCE_MODELS,
+    with URLs under the given origin (e.g. 'https://pokeapi.co').
+    """
+
+    table = reference_table(model)
+    summaries = _registry['summaries']
+
+    if (model, origin) not in summaries:
+
+        if len(summaries) >= MAX_ORIGINS * len(REFERENCE_MODELS):
+            summaries.clear()
+
+        summaries[(model, origin)] = {
+            id: OrderedDict((
+                ('name', name),
+                ('url', origin + reverse(view_name, kwargs={'pk': id}))))
+            for id, name in table.items()}
+
+    return summaries[(model, origin)]
+
+
+def requested_reference(query_params, param, model):
+    """
+    Returns the id of the row of one of the REFERENCE_MODELS given by name or id
+    in a query param, or None if the param is missing.
+    """
+
+    if param not in query_params:
+        return None
+
+    value = query_params[param]
+    table = reference_table(model)
+
+    if value.isdigit() and int(value) in table:
+        return int(value)
+
+    for id, name in table.items():
+        if name == value:
+            return id
+
+    raise ValidationError({param: 'Unknown {} "{}".'.format(model._meta.verbose_name, value)})
+
+
+def clear_reference_tables(sender=None, **kwargs):
+
+    if sender is None:
+        _registry['tables'].clear()
+        _registry['summaries'].clear()
+        return
+
+    _registry['tables'].pop(sender, None)
+    for key in [key for key in _registry['summaries'] if key[0] is sender]:
+        del _registry['summaries'][key]
+
+
+for reference_model in REFERENCE_MODELS:
+    post_save.connect(clear_reference_tables, sender=reference_model)
+    post_delete.connect(clear_reference_tables, sender=reference_model)
@@ -0,0 +1,263 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+from .generation import current_generation, normalized_url
+
+# The response cache keeps the rendered bytes of successful GET responses under
+# /api/v2/, keyed by build generation, host, path and query string (with its
+# params sorted), in the cache named by settings.RESPONSE_CACHE. Nothing is
+# cached until a build generation has been published.
+#
+# When a key is missing only one worker renders it: the others wait for it a
+# little while, and get the response of the previous generation meanwhile if
+# there is one (right after a build, every key misses at once). The lock is an
+# add() to the cache, which is atomic in Redis and memcached.
+#
+# In front of it every worker keeps the entries it served last in memory, up to
+# settings.RESPONSE_CACHE_LOCAL_BYTES, so the hottest URLs don't need a round
+# trip to Redis. That tier only holds the current generation: it is emptied as
+# soon as a worker sees a new one.
+
+CACHED_PATH = '/api/v2/'
+UNCACHED_PATH = '/api/v2/debug/'
+
+# Headers kept along with the content
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Cache-Control')
+
+# How long a worker may hold the lock on a key, and how long others wait for it (in seconds)
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2
+LOCK_POLL = 0.05
+
+_stats = {
+    'hits': 0, 'local_hits': 0, 'misses': 0, 'stale': 0, 'waits': 0, 'fills': 0,
+    'fill_time': 0.0}
+
+_local = None
+
+
+class LocalTier():
+    """
+    A least recently used set of entries of one build generation, holding at
+    most max_bytes of headers and content.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.generation = None
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, generation):
+
+        with self.lock:
+
+            if generation != self.generation:
+                self.clear()
+                self.generation = generation
+                return None
+
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+
+            return entry
+
+    def set(self, key, entry, generation):
+
+        size = entry_size(key, entry)
+
+        with self.lock:
+
+            if generation != self.generation or size > self.max_bytes:
+                return
+
+            if key in self.entries:
+                self.size -= entry_size(key, self.entries.pop(key))
+
+            self.entries[key] = entry
+            self.size += size
+
+            while self.size > self.max_bytes:
+                old_key, old_entry = self.entries.popitem(last=False)
+                self.size -= entry_size(old_key, old_entry)
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+
+def entry_size(key, entry):
+    headers, content = entry
+    return len(key) + len(content) + sum(len(header) + len(value) for header, value in headers)
+
+
+def response_cache():
+    return caches[settings.RESPONSE_CACHE] if settings.RESPONSE_CACHE else None
+
+
+def local_tier():
+    """
+    Returns the in-memory tier of this process, or None if it has no budget.
+    """
+
+    global _local
+
+    max_bytes = settings.RESPONSE_CACHE_LOCAL_BYTES
+
+    if not max_bytes:
+        return None
+
+    if _local is None or _local.max_bytes != max_bytes:
+        _local = LocalTier(max_bytes)
+
+    return _local
+
+
+def response_key(request, generation):
+    """
+    Returns the cache key of a request for a build generation, made of the
+    same normalized URL as its ETag.
+    """
+
+    url = normalized_url(request)
+
+    return 'response:{}:{}'.format(generation, hashlib.sha1(url.encode('utf-8')).hexdigest())
+
+
+def cached_response(entry, request, source):
+    """
+    Returns the response for a cache entry, or a 304 if the request has its ETag.
+    """
+
+    headers, content = entry
+    etag = dict(headers).get('ETag')
+
+    if etag is not None and etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content)
+
+    for header, value in headers:
+        response[header] = value
+    response['X-Cache'] = source
+
+    return response
+
+
+def response_cache_stats():
+    """
+    Returns the counters of this process, with the hit ratio of each tier
+    and the mean time to fill an entry (in seconds).
+    """
+
+    stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    remote_lookups = lookups - stats['local_hits']
+
+    stats['local_hit_ratio'] = stats['local_hits'] / lookups if lookups else None
+    stats['remote_hit_ratio'] = (
+        (stats['hits'] - stats['local_hits']) / remote_lookups if remote_lookups else None)
+    stats['mean_fill_time'] = stats['fill_time'] / stats['fills'] if stats['fills'] else None
+
+    local = local_tier()
+    stats['local_entries'] = len(local.entries) if local is not None else 0
+    stats['local_bytes'] = local.size if local is not None else 0
+
+    return stats
+
+
+class ResponseCacheMiddleware():
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+
+        cache = response_cache()
+
+        if (cache is None or request.method != 'GET' or
+                not request.path.startswith(CACHED_PATH) or
+                request.path.startswith(UNCACHED_PATH)):
+            return self.get_response(request)
+
+        generation = current_generation()
+
+        if not generation:
+            return self.get_response(request)
+
+        key = response_key(request, generation)
+        local = local_tier()
+
+        entry = local.get(key, generation) if local is not None else None
+
+        if entry is not None:
+            _stats['hits'] += 1
+            _stats['local_hits'] += 1
+            return cached_response(entry, request, 'HIT')
+
+        entry = cache.get(key)
+
+        if entry is not None:
+            _stats['hits'] += 1
+            if local is not None:
+                local.set(key, entry, generation)
+            return cached_response(entry, request, 'HIT')
+
+        _stats['misses'] += 1
+
+        lock_key = key + ':lock'
+        token = '{}:{}'.format(os.getpid(), id(request))
+
+        if not cache.add(lock_key, token, LOCK_TIMEOUT):
+
+            # Another worker is rendering it
+            stale = cache.get(response_key(request, generation - 1))
+
+            if stale is not None:
+                _stats['stale'] += 1
+                return cached_response(stale, request, 'STALE')
+
+            _stats['waits'] += 1
+            deadline = time.monotonic() + LOCK_WAIT
+
+            while time.monotonic() < deadline:
+                time.sleep(LOCK_POLL)
+                entry = cache.get(key)
+                if entry is not None:
+                    _stats['hits'] += 1
+                    if local is not None:
+                        local.set(key, entry, generation)
+                    return cached_response(entry, request, 'HIT')
+
+            # Took too long, render it here as well
+            return self.get_response(request)
+
+        try:
+            started = time.monotonic()
+            response = self.get_response(request)
+
+            if response.status_code == 200 and not response.streaming:
+                headers = [
+                    (header, response[header]) for header in CACHED_HEADERS if header in response]
+                entry = (headers, response.content)
+                cache.set(key, entry, settings.RESPONSE_CACHE_TIMEOUT)
+                if local is not None:
+                    local.set(key, entry, generation)
+                _stats['fills'] += 1
+                _stats['fill_time'] += time.monotonic() - started
+
+            response['X-Cache'] = 'MISS'
+            return response
+
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
@@ -1,13 +1,22 @@
 from collections import OrderedDict
 import json
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
 from django.urls import reverse
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 
 # pylint: disable=redefined-builtin
 
 # PokeAPI v2 serializers in order of dependency
 
 from .models import *
+from .encounters import summarize_location_area_encounters
+from .evolutions import summarize_evolution_chains
+from .languages import in_language
+from .registry import reference_summaries
+from .sprites import sprite_url
+from .typechart import type_chart
 
 
 #########################
@@ -19,342 +28,481 @@ from .models import *
 # Putting summary serializers up top so there are no conflicts
 # with reference accross models due to script running order
 
-class AbilitySummarySerializer(serializers.HyperlinkedModelSerializer):
+class TemplateHyperlinkedIdentityField(serializers.HyperlinkedIdentityField):
+    """
+    Renders the url of a resource by putting its pk into a template worked out
+    once per request and view (e.g. 'https://pokeapi.co/api/v2/ability/{pk}/'),
+    rather than with a reverse() and build_absolute_uri() per object.
+    """
+
+    # Stands in for the pk while reversing, the router accepts anything but '/' and '.'
+    PK_PLACEHOLDER = '__pk__'
+
+    def get_url_template(self, view_name, request):
+
+        templates = getattr(request, 'url_templates', None)
+
+        if templates is None:
+            templates = request.url_templates = {}
+
+        if view_name not in templates:
+            url = request.build_absolute_uri(
+                reverse(view_name, kwargs={self.lookup_url_kwarg: self.PK_PLACEHOLDER}))
+            prefix, placeholder, suffix = url.partition(self.PK_PLACEHOLDER)
+            templates[view_name] = (prefix, suffix) if placeholder else None
+
+        return templates[view_name]
+
+    def get_url(self, obj, view_name, request, format):
+
+        pk = getattr(obj, self.lookup_field, None)
+
+        # Leave format suffixes, ?format= and versioned URLs to DRF
+        if (format or request is None or not isinstance(pk, int) or
+                getattr(request, 'versioning_scheme', None) is not None or
+                api_settings.URL_FORMAT_OVERRIDE in request.GET):
+            return super().get_url(obj, view_name, request, format)
+
+        template = self.get_url_template(view_name, request)
+
+        if template is None:
+            return super().get_url(obj, view_name, request, format)
+
+        return template[0] + str(pk) + template[1]
+
+
+class SummarySerializer(serializers.HyperlinkedModelSerializer):
+
+    serializer_url_field = TemplateHyperlinkedIdentityField
+
+
+class ReferenceSummaryMixin():
+    """
+    Mixin for the summary serializers of the small reference tables kept
+    by the registry (see registry.py), which renders their summaries
+    without queries or reverse().
+    """
+
+    def use_registry(self):
+        # Format suffixes and ?format= end up in the URLs, leave those to the url field
+        return ('request' in self.context and not self.context.get('format') and
+                api_settings.URL_FORMAT_OVERRIDE not in self.context['request'].GET)
+
+    def get_attribute(self, instance):
+
+        # Nested through a foreign key, take the id rather than fetching the row
+        if self.use_registry() and len(self.source_attrs) == 1:
+            try:
+                field = instance._meta.get_field(self.source_attrs[0])
+            except (AttributeError, FieldDoesNotExist):
+                field = None
+            if field is not None and field.many_to_one and field.concrete:
+                return getattr(instance, field.attname)
+
+        return super().get_attribute(instance)
+
+    def to_representation(self, instance):
+
+        model = self.Meta.model
+        id = instance if isinstance(instance, int) else instance.pk
+
+        if self.use_registry():
+            request = self.context['request']
+            summaries = reference_summaries(
+                model, self.fields['url'].view_name,
+                '{}://{}'.format(request.scheme, request.get_host()))
+            summary = summaries.get(id)
+            if summary is not None and len(self.fields) == len(summary):
+                return OrderedDict(summary)
+            if summary is not None:
+                # Pruned by a sparse fieldset (see fieldsets.py)
+                return OrderedDict((name, summary[name]) for name in self.fields)
+
+        if isinstance(instance, int):
+            instance = model.objects.get(pk=instance)
+
+        return super().to_representation(instance)
+
+
+class AbilitySummarySerializer(SummarySerializer):
 
     class Meta:
         model = Ability
         fields = ('name', 'url')
 
 
-class BerryFirmnessSummarySerializer(serializers.HyperlinkedModelSerializer):
+class BerryFirmnessSummarySerializer(SummarySerializer):
 
     class Meta:
         model = BerryFirmness
         fields = ('name', 'url')
 
 
-class BerryFlavorSummarySerializer(serializers.HyperlinkedModelSerializer):
+class BerryFlavorSummarySerializer(SummarySerializer):
 
     class Meta:
         model = BerryFlavor
         fields = ('name', 'url')
 
 
-class BerrySummarySerializer(serializers.HyperlinkedModelSerializer):
+class BerrySummarySerializer(SummarySerializer):
 
     class Meta:
         model = Berry
         fields = ('name', 'url')
 
 
-class CharacteristicSummarySerializer(serializers.HyperlinkedModelSerializer):
+class CharacteristicSummarySerializer(SummarySerializer):
 
     class Meta:
         model = Characteristic
         fields = ('url',)
 
 
-class ContestEffectSummarySerializer(serializers.HyperlinkedModelSerializer):
+class ContestEffectSummarySerializer(SummarySerializer):
 
     class Meta:
         model = ContestEffect
         fields = ('url',)
 
 
-class ContestTypeSummarySerializer(serializers.HyperlinkedModelSerializer):
+class ContestTypeSummarySerializer(SummarySerializer):
 
     class Meta:
         model = ContestType
         fields = ('name', 'url')
 
 
-class EggGroupSummarySerializer(serializers.HyperlinkedModelSerializer):
+class EggGroupSummarySerializer(SummarySerializer):
 
     class Meta:
         model = EggGroup
         fields = ('name', 'url')
 
 
-class EncounterConditionSummarySerializer(serializers.HyperlinkedModelSerializer):
+class EncounterConditionSummarySerializer(SummarySerializer):
 
     class Meta:
         model = EncounterCondition
         fields = ('name', 'url')
 
 
-class EncounterConditionValueSummarySerializer(serializers.HyperlinkedModelSerializer):
+class EncounterConditionValueSummarySerializer(SummarySerializer):
 
     class Meta:
         model = EncounterConditionValue
         fields = ('name', 'url')
 
 
-class EncounterMethodSummarySerializer(serializers.HyperlinkedModelSerializer):
+class EncounterMethodSummarySerializer(SummarySerializer):
 
     class Meta:
         model = EncounterMethod
         fields = ('name', 'url')
 
 
-class EvolutionTriggerSummarySerializer(serializers.HyperlinkedModelSerializer):
+class EvolutionTriggerSummarySerializer(SummarySerializer):
 
     class Meta:
         model = EvolutionTrigger
         fields = ('name', 'url')
 
 
-class EvolutionChainSummarySerializer(serializers.HyperlinkedModelSerializer):
+class EvolutionChainSummarySerializer(SummarySerializer):
 
     class Meta:
         model = EvolutionChain
         fields = ('url',)
 
 
-class GenerationSummarySerializer(serializers.HyperlinkedModelSerializer):
+class GenerationSummarySerializer(SummarySerializer):
 
     class Meta:
         model = Generation
         fields = ('name', 'url')
 
 
-class GenderSummarySerializer(serializers.HyperlinkedModelSerializer):
+class GenderSummarySerializer(SummarySerializer):
 
     class Meta:
         model = Gender
         fields = ('name', 'url')
 
 
-class GrowthRateSummarySerializer(serializers.HyperlinkedModelSerializer):
+class GrowthRateSummarySerializer(SummarySerializer):
 
     class Meta:
         model = GrowthRate
         fields = ('name', 'url')
 
 
-class ItemPocketSummarySerializer(serializers.HyperlinkedModelSerializer):
+class ItemPocketSummarySerializer(SummarySerializer):
 
     class Meta:
         model = ItemPocket
         fields = ('name', 'url')
 
 
-class ItemCategorySummarySerializer(serializers.HyperlinkedModelSerializer):
+class ItemCategorySummarySerializer(SummarySerializer):
 
     class Meta:
         model = ItemCategory
         fields = ('name', 'url')
 
 
-class ItemAttributeSummarySerializer(serializers.HyperlinkedModelSerializer):
+class ItemAttributeSummarySerializer(SummarySerializer):
 
     class Meta:
         model = ItemAttribute
         fields = ('name', 'url')
 
 
-class ItemFlingEffectSummarySerializer(serializers.HyperlinkedModelSerializer):
+class ItemFlingEffectSummarySerializer(SummarySerializer):
 
     class Meta:
         model = ItemFlingEffect
         fields = ('name', 'url')
 
 
-class ItemSummarySerializer(serializers.HyperlinkedModelSerializer):
+class ItemSummarySerializer(SummarySerializer):
 
     class Meta:
         model = Item
         fields = ('name', 'url')
 
 
-class LanguageSummarySerializer(serializers.HyperlinkedModelSerializer):
+class LanguageSummarySerializer(ReferenceSummaryMixin, SummarySerializer):
 
     class Meta:
         model = Language
         fields = ('name', 'url')
 
 
-class LocationSummarySerializer(serializers.HyperlinkedModelSerializer):
+class LocationSummarySerializer(SummarySerializer):
 
     class Meta:
         model = Location
         fields = ('name', 'url')
 
 
-class LocationAreaSummarySerializer(serializers.HyperlinkedModelSerializer):
+class LocationAreaSummarySerializer(SummarySerializer):
 
     class Meta:
         model = LocationArea
         fields = ('name', 'url')
 
 
-class MachineSummarySerializer(serializers.HyperlinkedModelSerializer):
+class MachineSummarySerializer(SummarySerializer):
 
     class Meta:
         model = Machine
         fields = ('url',)
 
 
-class MoveBattleStyleSummarySerializer(serializers.HyperlinkedModelSerializer):
+class MoveBattleStyleSummarySerializer(SummarySerializer):
 
     class Meta:
         model = MoveBattleStyle
         fields = ('name', 'url')
 
 
-class MoveDamageClassSummarySerializer(serializers.HyperlinkedModelSerializer):
+class MoveDamageClassSummarySerializer(SummarySerializer):
 
     class Meta:
         model = MoveDamageClass
         fields = ('name', 'url')
 
 
-class MoveMetaAilmentSummarySerializer(serializers.HyperlinkedModelSerializer):
+class MoveMetaAilmentSummarySerializer(SummarySerializer):
 
     class Meta:
         model = MoveMetaAilment
         fields = ('name', 'url')
 
 
-class MoveMetaCategorySummarySerializer(serializers.HyperlinkedModelSerializer):
+class MoveMetaCategorySummarySerializer(SummarySerializer):
 
     class Meta:
         model = MoveMetaCategory
         fields = ('name', 'url')
 
 
-class MoveTargetSummarySerializer(serializers.HyperlinkedModelSerializer):
+class MoveTargetSummarySerializer(SummarySerializer):
 
     class Meta:
         model = MoveTarget
         fields = ('name', 'url')
 
 
-class MoveSummarySerializer(serializers.HyperlinkedModelSerializer):
+class MoveSummarySerializer(SummarySerializer):
 
     class Meta:
         model = Move
         fields = ('name', 'url')
 
 
-class MoveLearnMethodSummarySerializer(serializers.HyperlinkedModelSerializer):
+class MoveLearnMethodSummarySerializer(SummarySerializer):
 
     class Meta:
         model = MoveLearnMethod
         fields = ('name', 'url')
 
 
-class NatureSummarySerializer(serializers.HyperlinkedModelSerializer):
+class NatureSummarySerializer(SummarySerializer):
 
     class Meta:
         model = Nature
         fields = ('name', 'url')
 
 
-class PalParkAreaSummarySerializer(serializers.HyperlinkedModelSerializer):
+class PalParkAreaSummarySerializer(SummarySerializer):
 
     class Meta:
         model = PalParkArea
         fields = ('name', 'url')
 
 
-class PokeathlonStatSummarySerializer(serializers.HyperlinkedModelSerializer):
+class PokeathlonStatSummarySerializer(SummarySerializer):
 
     class Meta:
         model = PokeathlonStat
         fields = ('name', 'url')
 
 
-class PokedexSummarySerializer(serializers.HyperlinkedModelSerializer):
+class PokedexSummarySerializer(SummarySerializer):
 
     class Meta:
         model = Pokedex
         fields = ('name', 'url')
 
 
-class PokemonColorSummarySerializer(serializers.HyperlinkedModelSerializer):
+class PokemonColorSummarySerializer(SummarySerializer):
 
     class Meta:
         model = PokemonColor
         fields = ('name', 'url')
 
 
-class PokemonHabitatSummarySerializer(serializers.HyperlinkedModelSerializer):
+class PokemonHabitatSummarySerializer(SummarySerializer):
 
     class Meta:
         model = PokemonHabitat
         fields = ('name', 'url')
 
 
-class PokemonShapeSummarySerializer(serializers.HyperlinkedModelSerializer):
+class PokemonShapeSummarySerializer(SummarySerializer):
 
     class Meta:
         model = PokemonShape
         fields = ('name', 'url')
 
 
-class PokemonSummarySerializer(serializers.HyperlinkedModelSerializer):
+class PokemonSummarySerializer(SummarySerializer):
 
     class Meta:
         model = Pokemon
         fields = ('name', 'url')
 
 
-class PokemonSpeciesSummarySerializer(serializers.HyperlinkedModelSerializer):
+class PokemonSpeciesSummarySerializer(SummarySerializer):
 
     class Meta:
         model = PokemonSpecies
         fields = ('name', 'url')
 
 
-class PokemonFormSummarySerializer(serializers.HyperlinkedModelSerializer):
+class PokemonFormSummarySerializer(SummarySerializer):
 
     class Meta:
         model = PokemonForm
         fields = ('name', 'url')
 
 
-class RegionSummarySerializer(serializers.HyperlinkedModelSerializer):
+class RegionSummarySerializer(SummarySerializer):
 
     class Meta:
         model = Region
         fields = ('name', 'url')
 
 
-class StatSummarySerializer(serializers.HyperlinkedModelSerializer):
+class StatSummarySerializer(ReferenceSummaryMixin, SummarySerializer):
 
     class Meta:
         model = Stat
         fields = ('name', 'url')
 
 
-class SuperContestEffectSummarySerializer(serializers.HyperlinkedModelSerializer):
+class SuperContestEffectSummarySerializer(SummarySerializer):
 
     class Meta:
         model = SuperContestEffect
         fields = ('url',)
 
 
-class TypeSummarySerializer(serializers.HyperlinkedModelSerializer):
+class TypeSummarySerializer(ReferenceSummaryMixin, SummarySerializer):
 
     class Meta:
         model = Type
         fields = ('name', 'url')
 
 
-class VersionSummarySerializer(serializers.HyperlinkedModelSerializer):
+class VersionSummarySerializer(ReferenceSummaryMixin, SummarySerializer):
 
     class Meta:
         model = Version
         fields = ('name', 'url')
 
 
-class VersionGroupSummarySerializer(serializers.HyperlinkedModelSerializer):
+class VersionGroupSummarySerializer(ReferenceSummaryMixin, SummarySerializer):
 
     class Meta:
         model = VersionGroup
         fields = ('name', 'url')
 
 
+##########################
+#  BUILD SUMMARY HELPERS  #
+##########################
+
+class StoredRelationsMixin():
+    """
+    Mixin for serializers rendering structures stored by the build,
+    where related resources are kept as [id, name] pairs.
+    """
+
+    def get_related_summary(self, serializer_class, related):
+
+        if related is None:
+            return None
+
+        id, name = related
+        model = serializer_class.Meta.model
+
+        if not hasattr(self, 'related_summaries'):
+            self.related_summaries = {}
+
+        if (model, id) not in self.related_summaries:
+            self.related_summaries[(model, id)] = serializer_class(
+                model(pk=id, name=name), context=self.context).data
+
+        return self.related_summaries[(model, id)]
+
+
+########################
+#  SPRITE SERIALIZERS  #
+########################
+
+class SpritesSerializer(serializers.ModelSerializer):
+    """
+    Emits the sprite paths stored by the build as URLs under settings.SPRITES_URL
+    """
+
+    def to_representation(self, instance):
+
+        return OrderedDict(
+            (field, sprite_url(getattr(instance, field))) for field in self.Meta.fields)
+
+
 #####################
 #  MAP SERIALIZERS  #
 #####################
@@ -890,7 +1038,7 @@ class LocationAreaNameSerializer(serializers.ModelSerializer):
         fields = ('name', 'language')
 
 
-class LocationAreaDetailSerializer(serializers.ModelSerializer):
+class LocationAreaDetailSerializer(StoredRelationsMixin, serializers.ModelSerializer):
 
     location = LocationSummarySerializer()
     encounter_method_rates = serializers.SerializerMethodField('get_method_rates')
@@ -904,37 +1052,46 @@ class LocationAreaDetailSerializer(serializers.ModelSerializer):
             'location', 'names', 'pokemon_encounters'
         )
 
+    def get_encounter_summary(self, obj):
+
+        # The build stores the aggregated encounters of every area, see
+        # pokemon_v2/encounters.py. They are aggregated here when it hasn't.
+
+        if getattr(self, 'encounter_summary_area', None) != obj.pk:
+
+            summary = LocationAreaEncounterSummary.objects.filter(location_area=obj).first()
+
+            if summary is not None:
+                self.encounter_summary = (
+                    json.loads(summary.encounter_method_rates),
+                    json.loads(summary.pokemon_encounters))
+            else:
+                self.encounter_summary = summarize_location_area_encounters(
+                    [obj.pk]).get(obj.pk, ([], []))
+
+            self.encounter_summary_area = obj.pk
+            self.related_summaries = {}
+
+        return self.encounter_summary
+
     def get_method_rates(self, obj):
 
-        # Get encounters related to this area and pull out unique encounter methods
-        encounter_rates = LocationAreaEncounterRate.objects.filter(
-            location_area=obj).order_by('encounter_method_id')
-        method_ids = encounter_rates.values('encounter_method_id').distinct()
         encounter_rate_list = []
 
-        for id in method_ids:
+        for method_rates in self.get_encounter_summary(obj)[0]:
 
             encounter_rate_details = OrderedDict()
-
-            # Get each Unique Item by ID
-            encounter_method_object = EncounterMethod.objects.get(pk=id['encounter_method_id'])
-            encounter_method_data = EncounterMethodSummarySerializer(
-                encounter_method_object, context=self.context).data
-            encounter_rate_details['encounter_method'] = encounter_method_data
-
-            # Get Versions associated with each unique item
-            area_encounter_objects = encounter_rates.filter(
-                encounter_method_id=id['encounter_method_id'])
-            serializer = LocationAreaEncounterRateSerializer(
-                area_encounter_objects, many=True, context=self.context)
+            encounter_rate_details['encounter_method'] = self.get_related_summary(
+                EncounterMethodSummarySerializer, method_rates['encounter_method'])
             encounter_rate_details['version_details'] = []
 
-            for area_encounter in serializer.data:
+            for version_rate in method_rates['version_details']:
 
                 version_detail = OrderedDict()
 
-                version_detail['rate'] = area_encounter['rate']
-                version_detail['version'] = area_encounter['version']
+                version_detail['rate'] = version_rate['rate']
+                version_detail['version'] = self.get_related_summary(
+                    VersionSummarySerializer, version_rate['version'])
 
                 encounter_rate_details['version_details'].append(version_detail)
 
@@ -944,52 +1101,38 @@ class LocationAreaDetailSerializer(serializers.ModelSerializer):
 
     def get_encounters(self, obj):
 
-        # get versions for later use
-        version_objects = Version.objects.all()
-        version_data = VersionSummarySerializer(
-            version_objects, many=True, context=self.context).data
-
-        # all encounters associated with location area
-        all_encounters = Encounter.objects.filter(location_area=obj).order_by('pokemon')
         encounters_list = []
 
-        # break encounters into pokemon groupings
-        for poke in all_encounters.values('pokemon').distinct():
-
-            pokemon_object = Pokemon.objects.get(pk=poke['pokemon'])
+        for pokemon_encounters in self.get_encounter_summary(obj)[1]:
 
             pokemon_detail = OrderedDict()
-            pokemon_detail['pokemon'] = PokemonSummarySerializer(
-                pokemon_object, context=self.context).data
+            pokemon_detail['pokemon'] = self.get_related_summary(
+                PokemonSummarySerializer, pokemon_encounters['pokemon'])
             pokemon_detail['version_details'] = []
 
-            poke_encounters = all_encounters.filter(pokemon=poke['pokemon']).order_by('version')
+            for version_encounters in pokemon_encounters['version_details']:
 
-            # each pokemon has multiple versions it could be encountered in
-            for ver in poke_encounters.values('version').distinct():
                 version_detail = OrderedDict()
-                version_detail['version'] = version_data[ver['version'] - 1]
-                version_detail['max_chance'] = 0
+                version_detail['version'] = self.get_related_summary(
+                    VersionSummarySerializer, version_encounters['version'])
+                version_detail['max_chance'] = version_encounters['max_chance']
                 version_detail['encounter_details'] = []
 
-                poke_data = EncounterDetailSerializer(
-                    poke_encounters.filter(version=ver['version']),
-                    many=True, context=self.context).data
+                for encounter in version_encounters['encounter_details']:
 
-                # each version has multiple ways a pokemon can be encountered
-                for encounter in poke_data:
+                    encounter_detail = OrderedDict()
+                    encounter_detail['min_level'] = encounter['min_level']
+                    encounter_detail['max_level'] = encounter['max_level']
+                    encounter_detail['condition_values'] = [
+                        self.get_related_summary(
+                            EncounterConditionValueSummarySerializer, condition_value)
+                        for condition_value in encounter['condition_values']
+                    ]
+                    encounter_detail['chance'] = encounter['chance']
+                    encounter_detail['method'] = self.get_related_summary(
+                        EncounterMethodSummarySerializer, encounter['method'])
 
-                    slot = EncounterSlot.objects.get(pk=encounter['encounter_slot'])
-                    slot_data = EncounterSlotSerializer(slot, context=self.context).data
-                    del encounter['pokemon']
-                    del encounter['encounter_slot']
-                    del encounter['location_area']
-                    del encounter['version']
-                    encounter['chance'] = slot_data['chance']
-                    version_detail['max_chance'] += slot_data['chance']
-                    encounter['method'] = slot_data['encounter_method']
-
-                    version_detail['encounter_details'].append(encounter)
+                    version_detail['encounter_details'].append(encounter_detail)
 
                 pokemon_detail['version_details'].append(version_detail)
 
@@ -1332,11 +1475,11 @@ class ItemNameSerializer(serializers.ModelSerializer):
         fields = ('name', 'language')
 
 
-class ItemSpritesSerializer(serializers.ModelSerializer):
+class ItemSpritesSerializer(SpritesSerializer):
 
     class Meta:
         model = ItemSprites
-        fields = ('sprites',)
+        fields = ('default',)
 
 
 class ItemDetailSerializer(serializers.ModelSerializer):
@@ -1398,15 +1541,7 @@ class ItemDetailSerializer(serializers.ModelSerializer):
     def get_item_sprites(self, obj):
 
         sprites_object = ItemSprites.objects.get(item_id=obj)
-        sprites_data = ItemSpritesSerializer(sprites_object, context=self.context).data
-        sprites_data = json.loads(sprites_data['sprites'])
-        host = 'raw.githubusercontent.com/PokeAPI/sprites/master/'
-
-        for key in sprites_data:
-            if sprites_data[key]:
-                sprites_data[key] = 'https://' + host + sprites_data[key].replace('/media/', '')
-
-        return sprites_data
+        return ItemSpritesSerializer(sprites_object, context=self.context).data
 
     def get_item_attributes(self, obj):
 
@@ -1706,46 +1841,27 @@ class TypeDetailSerializer(serializers.ModelSerializer):
 
     def get_type_relationships(self, obj):
 
+        # The relations come from the in-memory type chart, whose names
+        # are enough to summarize the related types without querying them
+        chart = type_chart()
+
+        def type_summaries(type_relations, damage_factor):
+            return [
+                TypeSummarySerializer(
+                    Type(pk=type_id, name=chart.names[type_id]), context=self.context).data
+                for type_id, factor in type_relations if factor == damage_factor]
+
+        damage_to = chart.damage_to.get(obj.pk, [])
+        damage_from = chart.damage_from.get(obj.pk, [])
+
         relations = OrderedDict()
-        relations['no_damage_to'] = []
-        relations['half_damage_to'] = []
-        relations['double_damage_to'] = []
-
-        relations['no_damage_from'] = []
-        relations['half_damage_from'] = []
-        relations['double_damage_from'] = []
-
-        # Damage To
-        results = TypeEfficacy.objects.filter(damage_type=obj)
-        serializer = TypeEfficacySerializer(results, many=True, context=self.context)
-
-        for relation in serializer.data:
-            type = Type.objects.get(pk=relation['target_type'])
-            if relation['damage_factor'] == 200:
-                relations['double_damage_to'].append(
-                    TypeSummarySerializer(type, context=self.context).data)
-            elif relation['damage_factor'] == 50:
-                relations['half_damage_to'].append(
-                    TypeSummarySerializer(type, context=self.context).data)
-            elif relation['damage_factor'] == 0:
-                relations['no_damage_to'].append(
-                    TypeSummarySerializer(type, context=self.context).data)
-
-        # Damage From
-        results = TypeEfficacy.objects.filter(target_type=obj)
-        serializer = TypeEfficacySerializer(results, many=True, context=self.context)
-
-        for relation in serializer.data:
-            type = Type.objects.get(pk=relation['damage_type'])
-            if relation['damage_factor'] == 200:
-                relations['double_damage_from'].append(
-                    TypeSummarySerializer(type, context=self.context).data)
-            elif relation['damage_factor'] == 50:
-                relations['half_damage_from'].append(
-                    TypeSummarySerializer(type, context=self.context).data)
-            elif relation['damage_factor'] == 0:
-                relations['no_damage_from'].append(
-                    TypeSummarySerializer(type, context=self.context).data)
+        relations['no_damage_to'] = type_summaries(damage_to, 0)
+        relations['half_damage_to'] = type_summaries(damage_to, 50)
+        relations['double_damage_to'] = type_summaries(damage_to, 200)
+
+        relations['no_damage_from'] = type_summaries(damage_from, 0)
+        relations['half_damage_from'] = type_summaries(damage_from, 50)
+        relations['double_damage_from'] = type_summaries(damage_from, 200)
 
         return relations
 
@@ -1977,7 +2093,9 @@ class MoveChangeSerializer(serializers.ModelSerializer):
 
     def get_effects(self, obj):
 
-        effect_texts = MoveEffectEffectText.objects.filter(move_effect=obj.move_effect)
+        effect_texts = in_language(
+            MoveEffectEffectText.objects.filter(move_effect=obj.move_effect),
+            self.context.get('language_id'))
         data = MoveEffectEffectTextSerializer(effect_texts, many=True, context=self.context).data
 
         return data
@@ -2144,14 +2262,19 @@ class MoveDetailSerializer(serializers.ModelSerializer):
 
     def get_effect_text(self, obj):
 
-        effect_texts = MoveEffectEffectText.objects.filter(move_effect=obj.move_effect)
+        effect_texts = in_language(
+            MoveEffectEffectText.objects.filter(move_effect=obj.move_effect),
+            self.context.get('language_id'))
         data = MoveEffectEffectTextSerializer(effect_texts, many=True, context=self.context).data
 
         return data
 
     def get_effect_change_text(self, obj):
 
-        effect_changes = MoveEffectChange.objects.filter(move_effect=obj.move_effect)
+        effect_changes = MoveEffectChange.objects.filter(
+            move_effect=obj.move_effect).prefetch_related(Prefetch(
+                'moveeffectchangeeffecttext', queryset=in_language(
+                    MoveEffectChangeEffectText.objects.all(), self.context.get('language_id'))))
         data = MoveEffectChangeSerializer(effect_changes, many=True, context=self.context).data
 
         return data
@@ -2240,11 +2363,11 @@ class PokemonColorDetailSerializer(serializers.ModelSerializer):
 ##############################
 #  POKEMON FORM SERIALIZERS  #
 ##############################
-class PokemonFormSpritesSerializer(serializers.ModelSerializer):
+class PokemonFormSpritesSerializer(SpritesSerializer):
 
     class Meta:
         model = PokemonFormSprites
-        fields = ('sprites',)
+        fields = ('front_default', 'front_shiny', 'back_default', 'back_shiny')
 
 
 class PokemonFormNameSerializer(serializers.ModelSerializer):
@@ -2274,7 +2397,9 @@ class PokemonFormDetailSerializer(serializers.ModelSerializer):
 
     def get_pokemon_form_names(self, obj):
 
-        form_results = PokemonFormName.objects.filter(pokemon_form=obj, name__regex=".+")
+        form_results = in_language(
+            PokemonFormName.objects.filter(pokemon_form=obj, name__regex=".+"),
+            self.context.get('language_id'))
         form_serializer = PokemonFormNameSerializer(form_results, many=True, context=self.context)
 
         data = form_serializer.data
@@ -2286,7 +2411,9 @@ class PokemonFormDetailSerializer(serializers.ModelSerializer):
 
     def get_pokemon_form_pokemon_names(self, obj):
 
-        form_results = PokemonFormName.objects.filter(pokemon_form=obj, pokemon_name__regex=".+")
+        form_results = in_language(
+            PokemonFormName.objects.filter(pokemon_form=obj, pokemon_name__regex=".+"),
+            self.context.get('language_id'))
         form_serializer = PokemonFormNameSerializer(form_results, many=True, context=self.context)
 
         data = form_serializer.data
@@ -2300,16 +2427,7 @@ class PokemonFormDetailSerializer(serializers.ModelSerializer):
     def get_pokemon_form_sprites(self, obj):
 
         sprites_object = PokemonFormSprites.objects.get(pokemon_form_id=obj)
-        sprites_data = PokemonFormSpritesSerializer(sprites_object, context=self.context).data
-        sprites_data = json.loads(sprites_data['sprites'])
-
-        host = 'raw.githubusercontent.com/PokeAPI/sprites/master/'
-
-        for key in sprites_data:
-            if sprites_data[key]:
-                sprites_data[key] = 'https://' + host + sprites_data[key].replace('/media/', '')
-
-        return sprites_data
+        return PokemonFormSpritesSerializer(sprites_object, context=self.context).data
 
 
 #################################
@@ -2415,7 +2533,8 @@ class PokemonShapeDetailSerializer(serializers.ModelSerializer):
 
     def get_shape_names(self, obj):
 
-        results = PokemonShapeName.objects.filter(pokemon_shape_id=obj)
+        results = in_language(
+            PokemonShapeName.objects.filter(pokemon_shape_id=obj), self.context.get('language_id'))
         serializer = PokemonShapeNameSerializer(results, many=True, context=self.context)
         data = serializer.data
 
@@ -2426,7 +2545,8 @@ class PokemonShapeDetailSerializer(serializers.ModelSerializer):
 
     def get_shape_awesome_names(self, obj):
 
-        results = PokemonShapeName.objects.filter(pokemon_shape_id=obj)
+        results = in_language(
+            PokemonShapeName.objects.filter(pokemon_shape_id=obj), self.context.get('language_id'))
         serializer = PokemonShapeNameSerializer(results, many=True, context=self.context)
         data = serializer.data
 
@@ -2474,11 +2594,57 @@ class PokemonGameIndexSerializer(serializers.ModelSerializer):
         fields = ('game_index', 'version')
 
 
-class PokemonSpritesSerializer(serializers.ModelSerializer):
+class PokemonSpritesSerializer(SpritesSerializer):
 
     class Meta:
         model = PokemonSprites
-        fields = ('sprites',)
+        fields = (
+            'front_default', 'front_female', 'front_shiny', 'front_shiny_female',
+            'back_default', 'back_female', 'back_shiny', 'back_shiny_female')
+
+
+def summarize_pokemon_moves(pokemon_moves, context):
+    """
+    Groups a queryset of PokemonMove rows into the entries of the moves array of
+    a pokemon, one per move with the details of every version group.
+    """
+
+    # Ordering by move_id keeps the moves in the same order as the entries
+    pokemon_moves = (pokemon_moves
+                     .select_related('move', 'version_group', 'move_learn_method')
+                     .order_by('move_id', 'id'))
+
+    # Each version group and learn method is only serialized once
+    version_data = {}
+    method_data = {}
+    moves = OrderedDict()
+
+    for pokemon_move in pokemon_moves:
+
+        if pokemon_move.move_id not in moves:
+            pokemon_move_details = OrderedDict()
+            pokemon_move_details['move'] = MoveSummarySerializer(
+                pokemon_move.move, context=context).data
+            pokemon_move_details['version_group_details'] = []
+            moves[pokemon_move.move_id] = pokemon_move_details
+
+        if pokemon_move.version_group_id not in version_data:
+            version_data[pokemon_move.version_group_id] = VersionGroupSummarySerializer(
+                pokemon_move.version_group, context=context).data
+
+        if pokemon_move.move_learn_method_id not in method_data:
+            method_data[pokemon_move.move_learn_method_id] = MoveLearnMethodSummarySerializer(
+                pokemon_move.move_learn_method, context=context).data
+
+        version_detail = OrderedDict()
+
+        version_detail['level_learned_at'] = pokemon_move.level
+        version_detail['version_group'] = version_data[pokemon_move.version_group_id]
+        version_detail['move_learn_method'] = method_data[pokemon_move.move_learn_method_id]
+
+        moves[pokemon_move.move_id]['version_group_details'].append(version_detail)
+
+    return list(moves.values())
 
 
 class PokemonDetailSerializer(serializers.ModelSerializer):
@@ -2519,62 +2685,20 @@ class PokemonDetailSerializer(serializers.ModelSerializer):
     def get_pokemon_sprites(self, obj):
 
         sprites_object = PokemonSprites.objects.get(pokemon_id=obj)
-        sprites_data = PokemonSpritesSerializer(sprites_object, context=self.context).data
-        sprites_data = json.loads(sprites_data['sprites'])
-        host = 'raw.githubusercontent.com/PokeAPI/sprites/master/'
-
-        for key in sprites_data:
-            if sprites_data[key]:
-                sprites_data[key] = 'https://' + host + sprites_data[key].replace('/media/', '')
-
-        return sprites_data
+        return PokemonSpritesSerializer(sprites_object, context=self.context).data
 
     def get_pokemon_moves(self, obj):
 
-        version_objects = VersionGroup.objects.all()
-        version_data = VersionGroupSummarySerializer(
-            version_objects, many=True, context=self.context).data
-        method_objects = MoveLearnMethod.objects.all()
-        method_data = MoveLearnMethodSummarySerializer(
-            method_objects, many=True, context=self.context).data
+        # Load every move entry of this pokemon (or those of one version group,
+        # with ?version_group=) along with its move, version group and learn
+        # method in one query, then group the entries by move in memory.
 
-        # Get moves related to this pokemon and pull out unique Move IDs.
-        # Note that it's important to order by the same column we're using to
-        # determine if the entries are unique.  Otherwise distinct() will
-        # return apparent duplicates.
+        pokemon_moves = PokemonMove.objects.filter(pokemon_id=obj)
 
-        pokemon_moves = PokemonMove.objects.filter(pokemon_id=obj).order_by('move_id')
-        move_ids = pokemon_moves.values('move_id').distinct()
-        move_list = []
+        if self.context.get('version_group_id') is not None:
+            pokemon_moves = pokemon_moves.filter(version_group_id=self.context['version_group_id'])
 
-        for id in move_ids:
-
-            pokemon_move_details = OrderedDict()
-
-            # Get each Unique Move by ID
-            move_object = Move.objects.get(pk=id['move_id'])
-            move_data = MoveSummarySerializer(move_object, context=self.context).data
-            pokemon_move_details['move'] = move_data
-
-            # Get Versions and Move Methods associated with each unique move
-            pokemon_move_objects = pokemon_moves.filter(move_id=id['move_id'])
-            serializer = PokemonMoveSerializer(
-                pokemon_move_objects, many=True, context=self.context)
-            pokemon_move_details['version_group_details'] = []
-
-            for move in serializer.data:
-
-                version_detail = OrderedDict()
-
-                version_detail['level_learned_at'] = move['level']
-                version_detail['version_group'] = version_data[move['version_group'] - 1]
-                version_detail['move_learn_method'] = method_data[move['move_learn_method'] - 1]
-
-                pokemon_move_details['version_group_details'].append(version_detail)
-
-            move_list.append(pokemon_move_details)
-
-        return move_list
+        return summarize_pokemon_moves(pokemon_moves, self.context)
 
     def get_pokemon_held_items(self, obj):
 
@@ -2730,7 +2854,7 @@ class PokemonSpeciesDetailSerializer(serializers.ModelSerializer):
     shape = PokemonShapeSummarySerializer(source="pokemon_shape")
     evolves_from_species = PokemonSpeciesSummarySerializer()
     varieties = serializers.SerializerMethodField('get_pokemon_varieties')
-    evolution_chain = EvolutionChainSummarySerializer()
+    evolution_chain = serializers.SerializerMethodField('get_species_evolution_chain')
     pal_park_encounters = serializers.SerializerMethodField('get_encounters')
 
     class Meta:
@@ -2765,7 +2889,9 @@ class PokemonSpeciesDetailSerializer(serializers.ModelSerializer):
 
     def get_pokemon_names(self, obj):
 
-        species_results = PokemonSpeciesName.objects.filter(pokemon_species=obj)
+        species_results = in_language(
+            PokemonSpeciesName.objects.filter(pokemon_species=obj),
+            self.context.get('language_id'))
         species_serializer = PokemonSpeciesNameSerializer(
             species_results, many=True, context=self.context)
 
@@ -2778,7 +2904,9 @@ class PokemonSpeciesDetailSerializer(serializers.ModelSerializer):
 
     def get_pokemon_genera(self, obj):
 
-        results = PokemonSpeciesName.objects.filter(pokemon_species=obj)
+        results = in_language(
+            PokemonSpeciesName.objects.filter(pokemon_species=obj),
+            self.context.get('language_id'))
         serializer = PokemonSpeciesNameSerializer(results, many=True, context=self.context)
         data = serializer.data
         genera = []
@@ -2800,17 +2928,27 @@ class PokemonSpeciesDetailSerializer(serializers.ModelSerializer):
 
         return groups
 
+    def get_species_evolution_chain(self, obj):
+
+        # Only the id goes into the summary, no need to load the chain
+        if obj.evolution_chain_id is None:
+            return None
+
+        return EvolutionChainSummarySerializer(
+            EvolutionChain(pk=obj.evolution_chain_id), context=self.context).data
+
     def get_pokemon_varieties(self, obj):
 
-        results = Pokemon.objects.filter(pokemon_species=obj)
+        # Only is_default and the summary are needed, so there's
+        # no point in rendering the details of every variety
+        results = list(Pokemon.objects.filter(pokemon_species=obj).only('name', 'is_default'))
         summary_data = PokemonSummarySerializer(results, many=True, context=self.context).data
-        detail_data = PokemonDetailSerializer(results, many=True, context=self.context).data
 
         varieties = []
 
-        for index, pokemon in enumerate(detail_data):
+        for index, pokemon in enumerate(results):
             entry = OrderedDict()
-            entry['is_default'] = pokemon['is_default']
+            entry['is_default'] = pokemon.is_default
             entry['pokemon'] = summary_data[index]
             varieties.append(entry)
 
@@ -2865,11 +3003,24 @@ class PokemonEvolutionSerializer(serializers.ModelSerializer):
         )
 
 
-class EvolutionChainDetailSerializer(serializers.ModelSerializer):
+class EvolutionChainDetailSerializer(StoredRelationsMixin, serializers.ModelSerializer):
 
     baby_trigger_item = ItemSummarySerializer()
     chain = serializers.SerializerMethodField('build_chain')
 
+    # Summary serializers of the relations in stored evolution details
+    evolution_detail_relations = {
+        'item': ItemSummarySerializer,
+        'trigger': EvolutionTriggerSummarySerializer,
+        'held_item': ItemSummarySerializer,
+        'known_move': MoveSummarySerializer,
+        'known_move_type': TypeSummarySerializer,
+        'location': LocationSummarySerializer,
+        'party_species': PokemonSpeciesSummarySerializer,
+        'party_type': TypeSummarySerializer,
+        'trade_species': PokemonSpeciesSummarySerializer,
+    }
+
     class Meta:
         model = EvolutionChain
         fields = (
@@ -2880,51 +3031,41 @@ class EvolutionChainDetailSerializer(serializers.ModelSerializer):
 
     def build_chain(self, obj):
 
-        chain_id = obj.id
+        # The build stores the tree of every chain, see pokemon_v2/evolutions.py.
+        # It is put together here when it hasn't.
 
-        pokemon_objects = PokemonSpecies.objects.filter(
-            evolution_chain_id=chain_id).order_by('order')
-        summary_data = PokemonSpeciesSummarySerializer(
-            pokemon_objects, many=True, context=self.context).data
-        ref_data = PokemonSpeciesEvolutionSerializer(
-            pokemon_objects, many=True, context=self.context).data
+        summary = EvolutionChainSummary.objects.filter(evolution_chain=obj).first()
 
-        chain = entry = OrderedDict()
-        current_evolutions = None
-        evolution_data = None
-        previous_entry = None
-        previous_species = None
+        if summary is not None:
+            chain = json.loads(summary.chain)
+        else:
+            chain = summarize_evolution_chains([obj.pk]).get(obj.pk, {})
 
-        for index, species in enumerate(ref_data):
+        return self.build_entry(chain) if chain else OrderedDict()
 
-            # If evolves from something
-            if species['evolves_from_species']:
+    def build_entry(self, stored_entry):
 
-                # In case this pokemon is one of multiple evolutions a pokemon can make
-                if previous_species:
-                    if previous_species['id'] == species['evolves_from_species']:
-                        current_evolutions = previous_entry['evolves_to']
+        entry = OrderedDict()
+        entry['is_baby'] = stored_entry['is_baby']
+        entry['species'] = self.get_related_summary(
+            PokemonSpeciesSummarySerializer, stored_entry['species'])
+        entry['evolution_details'] = []
+        entry['evolves_to'] = [
+            self.build_entry(evolution) for evolution in stored_entry['evolves_to']]
 
-                entry = OrderedDict()
+        for stored_details in stored_entry['evolution_details']:
 
-                evolution_object = PokemonEvolution.objects.filter(
-                    evolved_species=species['id'])
-
-                evolution_data = PokemonEvolutionSerializer(
-                    evolution_object, many=True, context=self.context).data
-
-                current_evolutions.append(entry)
+            details = OrderedDict()
 
-            entry['is_baby'] = species['is_baby']
-            entry['species'] = summary_data[index]
-            entry['evolution_details'] = evolution_data or []
-            entry['evolves_to'] = []
+            for field, value in stored_details.items():
+                if field in self.evolution_detail_relations:
+                    value = self.get_related_summary(
+                        self.evolution_detail_relations[field], value)
+                details[field] = value
 
-            # Keep track of previous entries for complex chaining
-            previous_entry = entry
-            previous_species = species
+            entry['evolution_details'].append(details)
 
-        return chain
+        return entry
 
 
 class PokemonDexNumberSerializer(serializers.ModelSerializer):
@@ -0,0 +1,254 @@
+import json
+import mmap
+import os
+import shutil
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from drf_ujson.renderers import UJSONRenderer
+
+from .generation import current_generation
+
+# The snapshot store holds every list and detail response of the API,
+# rendered once by the build. Each resource gets two files in
+# <BUILD_ARTIFACTS_DIR>/snapshots/<generation>/:
+#
+#   <basename>.dat  the rendered JSON documents, back to back
+#   <basename>.idx  offsets into the .dat file for the list summaries
+#                   and for each detail document by id and by name
+#
+# Documents are rendered against a placeholder origin which is swapped
+# for the origin of the incoming request when they are served.
+
+SNAPSHOT_HOST = 'snapshot.pokeapi.co'
+SNAPSHOT_ORIGIN = 'http://' + SNAPSHOT_HOST
+
+RENDERER = UJSONRenderer()
+
+
+def escape(text):
+    # Escaped the same way the renderer escapes strings inside documents
+    return RENDERER.render(text)[1:-1]
+
+
+ESCAPED_SNAPSHOT_ORIGIN = escape(SNAPSHOT_ORIGIN)
+
+
+def snapshot_root():
+    return os.path.join(settings.BUILD_ARTIFACTS_DIR, 'snapshots')
+
+
+def snapshot_path(generation):
+    return os.path.join(snapshot_root(), str(generation))
+
+
+###########
+#  WRITE  #
+###########
+
+def snapshot_request():
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = '/'
+    request.META['HTTP_HOST'] = SNAPSHOT_HOST
+    return request
+
+
+def new_snapshot(generation):
+    """
+    Creates an empty snapshot directory for the given generation.
+    Nothing reads it until the generation is published.
+    """
+
+    path = snapshot_path(generation)
+
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+
+    return path
+
+
+def write_resource(path, viewset, basename):
+
+    model = viewset.queryset.model
+    context = {'request': snapshot_request()}
+    detail_serializer = viewset.serializer_class
+    list_serializer = getattr(viewset, 'list_serializer_class', None) or detail_serializer
+    index_names = (hasattr(viewset, 'namePattern') and
+                   any(field.name == 'name' for field in model._meta.fields))
+
+    summaries = []
+    ids = {}
+    names = {}
+    duplicate_names = set()
+    offset = 0
+
+    with open(os.path.join(path, basename + '.dat'), 'wb') as data:
+
+        for obj in viewset.queryset.all().iterator():
+
+            content = RENDERER.render(list_serializer(obj, context=context).data)
+            data.write(content)
+            summaries.extend((offset, len(content)))
+            offset += len(content)
+
+            content = RENDERER.render(detail_serializer(obj, context=context).data)
+            data.write(content)
+            ids[str(obj.pk)] = (offset, len(content))
+            offset += len(content)
+
+            # NameOrIdRetrieval can't resolve ambiguous names, so leave them to it
+            if index_names and viewset.namePattern.match(obj.name):
+                if obj.name in names:
+                    duplicate_names.add(obj.name)
+                names[obj.name] = obj.pk
+
+    for name in duplicate_names:
+        del names[name]
+
+    with open(os.path.join(path, basename + '.idx'), 'wt') as index:
+        json.dump({'summaries': summaries, 'ids': ids, 'names': names}, index)
+
+    return len(ids)
+
+
+def prune_snapshots(generation):
+    """
+    Deletes every snapshot older than the one preceding the given
+    generation. The previous one is kept for requests still reading it.
+    """
+
+    if not os.path.isdir(snapshot_root()):
+        return
+
+    for name in os.listdir(snapshot_root()):
+        if name.isdigit() and int(name) < generation - 1:
+            shutil.rmtree(os.path.join(snapshot_root(), name))
+
+
+##########
+#  READ  #
+##########
+
+def snapshot_samples(path, count, origin):
+    """
+    Returns up to count detail documents of each resource of a snapshot,
+    spread evenly over its ids, with their URLs under the given origin.
+    """
+
+    escaped_origin = escape(origin)
+
+    samples = []
+
+    for name in sorted(os.listdir(path)):
+        if not name.endswith('.idx'):
+            continue
+
+        resource = SnapshotResource(path, name[:-len('.idx')])
+        ids = sorted(resource.ids, key=int)
+        step = max(len(ids) // count, 1)
+
+        samples.extend(
+            bytes(resource.by_id(pk)).replace(ESCAPED_SNAPSHOT_ORIGIN, escaped_origin)
+            for pk in ids[::step][:count])
+
+    return samples
+
+
+class SnapshotSummaries():
+    """
+    Sequence of the rendered list summaries of a resource, sliceable
+    like a queryset so it can be handed to the paginator.
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) // 2
+
+    def __getitem__(self, index):
+        start, stop, _ = index.indices(len(self))
+        offsets = self.offsets
+        return [
+            self.data[offsets[2 * i]:offsets[2 * i] + offsets[2 * i + 1]]
+            for i in range(start, stop)
+        ]
+
+
+class SnapshotResource():
+
+    def __init__(self, path, basename):
+
+        with open(os.path.join(path, basename + '.idx'), 'rt') as index_file:
+            index = json.load(index_file)
+
+        with open(os.path.join(path, basename + '.dat'), 'rb') as data_file:
+            if os.fstat(data_file.fileno()).st_size:
+                self.data = mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.data = b''
+
+        self.ids = index['ids']
+        self.names = index['names']
+        self.summaries = SnapshotSummaries(self.data, index['summaries'])
+
+    def by_id(self, pk):
+        entry = self.ids.get(str(pk))
+        if entry is None:
+            return None
+        return self.data[entry[0]:entry[0] + entry[1]]
+
+    def by_name(self, name):
+        pk = self.names.get(name)
+        return None if pk is None else self.by_id(pk)
+
+
+class Snapshot():
+
+    def __init__(self, generation, path):
+        self.generation = generation
+        self.path = path
+        self.resources = {}
+
+    def resource(self, basename):
+        if basename not in self.resources:
+            try:
+                self.resources[basename] = SnapshotResource(self.path, basename)
+            except FileNotFoundError:
+                self.resources[basename] = None
+        return self.resources[basename]
+
+
+_current = {'path': None, 'snapshot': None}
+
+
+def get_snapshot():
+    """
+    Returns the snapshot of the current build generation, or None if
+    that generation wasn't snapshotted.
+    """
+
+    generation = current_generation()
+    path = snapshot_path(generation)
+
+    if path != _current['path']:
+        _current['snapshot'] = Snapshot(generation, path) if os.path.isdir(path) else None
+        _current['path'] = path
+
+    return _current['snapshot']
+
+
+def render_page(envelope, items):
+    # The paginator's envelope is rendered with empty results so the
+    # prerendered summaries can be spliced in as they are
+    content = RENDERER.render(envelope)
+    head = content[:content.rindex(b'[]')]
+    return head + b'[' + b','.join(items) + b']}'
+
+
+def snapshot_response(content, request):
+    origin = request.build_absolute_uri('/')[:-1]
+    content = content.replace(ESCAPED_SNAPSHOT_ORIGIN, escape(origin))
+    return HttpResponse(content, content_type=RENDERER.media_type)
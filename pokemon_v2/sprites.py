@@ -0,0 +1,112 @@
+import json
+import os
+from django.conf import settings
+
+# The sprite manifest is the set of image paths under SPRITES_DIR, relative to it
+# and with forward slashes (e.g. 'pokemon/shiny/25.png'). Walking the ~7000 files
+# is slow, so the manifest is cached in <BUILD_ARTIFACTS_DIR>/sprite-manifest.json
+# along with the SPRITES_DIR it was read from and the mtime of every directory
+# under it. Adding, removing or renaming a file or directory changes the mtime of
+# its parent, so the manifest is only rebuilt when one of those mtimes changed,
+# or when SPRITES_DIR points somewhere else.
+
+MANIFEST_FILE = 'sprite-manifest.json'
+
+_manifest = {'root': None, 'directories': None, 'sprites': None}
+
+
+def manifest_path():
+    return os.path.join(settings.BUILD_ARTIFACTS_DIR, MANIFEST_FILE)
+
+
+def sprites_root():
+    return os.path.abspath(settings.SPRITES_DIR)
+
+
+def directory_mtimes(directories):
+    """
+    Returns {directory: mtime} for the given directories,
+    or None if one of them is gone.
+    """
+
+    mtimes = {}
+
+    for directory in directories:
+        try:
+            mtimes[directory] = os.stat(directory).st_mtime_ns
+        except OSError:
+            return None
+
+    return mtimes
+
+
+def walk_sprites(sprites_root):
+    """
+    Returns ({directory: mtime}, [sprite paths]) for everything under a sprites root.
+    """
+
+    directories = []
+    sprites = []
+
+    for root, dirs, files in os.walk(sprites_root):
+        directories.append(root)
+        directory = os.path.relpath(root, sprites_root).replace('\\', '/')
+        for file in files:
+            sprites.append(file if directory == '.' else directory + '/' + file)
+
+    return directory_mtimes(directories), sorted(sprites)
+
+
+def read_manifest():
+    try:
+        with open(manifest_path(), 'rt') as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return None, None, None
+
+    return manifest.get('root'), manifest.get('directories'), manifest.get('sprites')
+
+
+def write_manifest(root, directories, sprites):
+    path = manifest_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    temp_path = '{}.{}'.format(path, os.getpid())
+    with open(temp_path, 'wt') as manifest_file:
+        json.dump({'root': root, 'directories': directories, 'sprites': sprites}, manifest_file)
+    os.replace(temp_path, path)
+
+
+def sprite_manifest():
+    """
+    Returns the set of sprite paths, walking SPRITES_DIR only if it was moved
+    or a directory changed since the manifest was last written.
+    """
+
+    root = sprites_root()
+    directories = _manifest['directories']
+
+    if (_manifest['root'] == root and directories is not None and
+            directory_mtimes(directories) == directories):
+        return _manifest['sprites']
+
+    manifest_root, directories, sprites = read_manifest()
+
+    if (manifest_root != root or directories is None or
+            directory_mtimes(directories) != directories):
+        directories, sprites = walk_sprites(root)
+        write_manifest(root, directories, sprites)
+
+    _manifest['root'] = root
+    _manifest['directories'] = directories
+    _manifest['sprites'] = frozenset(sprites)
+
+    return _manifest['sprites']
+
+
+def sprite_url(path):
+    """
+    Returns the URL of a sprite path stored by the build, or None for no sprite.
+    """
+
+    return settings.SPRITES_URL + path if path else None
@@ -1,7 +1,28 @@
 import json
+import os
+import shutil
+import tempfile
+from unittest import mock, skipUnless
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django_redis.cache import RedisCache
 from rest_framework import status
 from rest_framework.test import APITestCase
+from pokemon_v2 import compression
 from pokemon_v2.models import *
+from pokemon_v2.encounters import location_area_encounter_summaries
+from pokemon_v2.evolutions import evolution_chain_summaries
+from pokemon_v2.generation import publish_generation
+from pokemon_v2.registry import REFERENCE_MODELS, reference_table
+from pokemon_v2.query_cache import install_query_cache, uninstall_query_cache
+from pokemon_v2.response_cache import (
+    LocalTier, local_tier, response_cache, response_cache_stats, response_key)
+from pokemon_v2.api import AbilityResource
+from pokemon_v2.snapshot import new_snapshot, snapshot_samples, write_resource
+from pokemon_v2.sprites import sprite_manifest
 
 # pylint: disable=redefined-builtin
 
@@ -10,6 +31,12 @@ MEDIA_HOST = 'https://raw.githubusercontent.com/PokeAPI/sprites/master/'
 API_V2 = '/api/v2'
 
 
+def load_reference_tables():
+    # Otherwise the first request to use them loads them (see registry.py)
+    for model in REFERENCE_MODELS:
+        reference_table(model)
+
+
 class APIData():
     """ Data Initializers"""
 
@@ -394,15 +421,11 @@ class APIData():
     @classmethod
     def setup_item_sprites_data(cls, item, default=True):
 
-        sprite_path = '/media/sprites/items/%s.png'
-
-        sprites = {
-            'default': sprite_path % item.id if default else None,
-        }
+        sprite_path = 'items/%s.png'
 
         item_sprites = ItemSprites.objects.create(
             item=item,
-            sprites=json.dumps(sprites)
+            default=sprite_path % item.id if default else None
         )
         item_sprites.save()
 
@@ -1729,18 +1752,14 @@ class APIData():
             front_default=True, front_shiny=False,
             back_default=False, back_shiny=False):
 
-        sprite_path = '/media/sprites/pokemon/%s.png'
-
-        sprites = {
-            'front_default': sprite_path % pokemon_form.id if front_default else None,
-            'front_shiny': sprite_path % pokemon_form.id if front_shiny else None,
-            'back_default': sprite_path % pokemon_form.id if back_default else None,
-            'back_shiny': sprite_path % pokemon_form.id if back_shiny else None,
-        }
+        sprite_path = 'pokemon/%s.png'
 
         pokemon_form_sprites = PokemonFormSprites.objects.create(
             pokemon_form=pokemon_form,
-            sprites=json.dumps(sprites)
+            front_default=sprite_path % pokemon_form.id if front_default else None,
+            front_shiny=sprite_path % pokemon_form.id if front_shiny else None,
+            back_default=sprite_path % pokemon_form.id if back_default else None,
+            back_shiny=sprite_path % pokemon_form.id if back_shiny else None
         )
         pokemon_form_sprites.save()
 
@@ -1863,22 +1882,18 @@ class APIData():
             back_female=False, back_shiny=False,
             back_shiny_female=False):
 
-        sprite_path = '/media/sprites/pokemon/%s.png'
-
-        sprites = {
-            'front_default': sprite_path % pokemon.id if front_default else None,
-            'front_female': sprite_path % pokemon.id if front_female else None,
-            'front_shiny': sprite_path % pokemon.id if front_shiny else None,
-            'front_shiny_female': sprite_path % pokemon.id if front_shiny_female else None,
-            'back_default': sprite_path % pokemon.id if back_default else None,
-            'back_female': sprite_path % pokemon.id if back_female else None,
-            'back_shiny': sprite_path % pokemon.id if back_shiny else None,
-            'back_shiny_female': sprite_path % pokemon.id if back_shiny_female else None,
-        }
+        sprite_path = 'pokemon/%s.png'
 
         pokemon_sprites = PokemonSprites.objects.create(
             pokemon=pokemon,
-            sprites=json.dumps(sprites)
+            front_default=sprite_path % pokemon.id if front_default else None,
+            front_female=sprite_path % pokemon.id if front_female else None,
+            front_shiny=sprite_path % pokemon.id if front_shiny else None,
+            front_shiny_female=sprite_path % pokemon.id if front_shiny_female else None,
+            back_default=sprite_path % pokemon.id if back_default else None,
+            back_female=sprite_path % pokemon.id if back_female else None,
+            back_shiny=sprite_path % pokemon.id if back_shiny else None,
+            back_shiny_female=sprite_path % pokemon.id if back_shiny_female else None
         )
         pokemon_sprites.save()
 
@@ -2044,7 +2059,7 @@ class APIData():
     @classmethod
     def setup_encounter_condition_value_map_data(cls, encounter, encounter_condition_value):
 
-        encounter_condition_value_map = EncounterConditionValue.objects.create(
+        encounter_condition_value_map = EncounterConditionValueMap.objects.create(
             encounter=encounter,
             encounter_condition_value=encounter_condition_value
         )
@@ -2627,8 +2642,6 @@ class APITests(APIData, APITestCase):
         )
         item_attribute_map.save()
 
-        sprites_data = json.loads(item_sprites.sprites)
-
         response = self.client.get('{}/item/{}/'.format(API_V2, item.pk), HTTP_HOST='testserver')
 
         # base params
@@ -2709,7 +2722,14 @@ class APITests(APIData, APITestCase):
         # sprites
         self.assertEqual(
             response.data['sprites']['default'],
-            '{}{}'.format(MEDIA_HOST, sprites_data['default'].replace('/media/', '')))
+            '{}sprites/{}'.format(MEDIA_HOST, item_sprites.default))
+
+        with override_settings(SPRITES_URL='https://cdn.example.com/sprites/'):
+            response = self.client.get(
+                '{}/item/{}/'.format(API_V2, item.pk), HTTP_HOST='testserver')
+        self.assertEqual(
+            response.data['sprites']['default'],
+            'https://cdn.example.com/sprites/{}'.format(item_sprites.default))
 
     # Berry Tests
     def test_berry_firmness_api(self):
@@ -3004,6 +3024,19 @@ class APITests(APIData, APITestCase):
             '{}{}/encounter-method/{}/'.format(
                 TEST_HOST, API_V2, encounter_slot2.encounter_method.pk))
 
+        # the summaries stored by the build give the same response
+        # without aggregating the encounters again
+        LocationAreaEncounterSummary.objects.bulk_create(
+            location_area_encounter_summaries([location_area.pk]))
+
+        with CaptureQueriesContext(connection) as context:
+            summary_response = self.client.get(
+                '{}/location-area/{}/'.format(API_V2, location_area.pk))
+
+        self.assertEqual(summary_response.content, response.content)
+        for query in context.captured_queries:
+            self.assertNotIn('pokemon_v2_encounter"', query['sql'])
+
     # Contest Tests
     def test_contest_type_api(self):
 
@@ -3236,6 +3269,45 @@ class APITests(APIData, APITestCase):
             response.data['game_indices'][0]['generation']['url'],
             '{}{}/generation/{}/'.format(TEST_HOST, API_V2, type_game_index.generation.pk))
 
+    def test_type_matchup_api(self):
+
+        fire = self.setup_type_data(name='fr tp for mtchp')
+        grass = self.setup_type_data(name='grss tp for mtchp')
+        poison = self.setup_type_data(name='psn tp for mtchp')
+        rock = self.setup_type_data(name='rck tp for mtchp')
+
+        for damage_type, target_type, damage_factor in (
+                (fire, grass, 200), (fire, rock, 50), (grass, poison, 50), (grass, rock, 200),
+                (poison, grass, 200), (poison, rock, 50), (rock, fire, 200)):
+            TypeEfficacy.objects.create(
+                damage_type=damage_type, target_type=target_type, damage_factor=damage_factor)
+
+        url = '{}/type-matchup/?attacking={},{}&defending={},{}/{},{}/{}'.format(
+            API_V2, fire.name, grass.pk, grass.name, grass.name, poison.name,
+            rock.pk, fire.pk)
+
+        response = self.client.get(url, HTTP_HOST='testserver')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [type['name'] for type in response.data['attacking']], [fire.name, grass.name])
+        self.assertEqual(
+            [[type['name'] for type in types] for types in response.data['defending']],
+            [[grass.name], [grass.name, poison.name], [rock.name, fire.name]])
+        self.assertEqual(
+            response.data['attacking'][0]['url'],
+            '{}{}/type/{}/'.format(TEST_HOST, API_V2, fire.pk))
+        self.assertEqual(response.data['damage_factors'], [[200, 200, 50], [100, 50, 200]])
+
+        # unknown, missing and triple types
+        for url in (
+                '{}/type-matchup/?attacking=nthng&defending={}'.format(API_V2, grass.pk),
+                '{}/type-matchup/?attacking={}'.format(API_V2, fire.pk),
+                '{}/type-matchup/?attacking={}&defending={}/{}/{}'.format(
+                    API_V2, fire.pk, grass.pk, poison.pk, rock.pk)):
+            response = self.client.get(url, HTTP_HOST='testserver')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     # Pokedex Tests
     def test_pokedex_api(self):
 
@@ -4087,6 +4159,34 @@ class APITests(APIData, APITestCase):
             response.data['pal_park_encounters'][0]['area']['url'],
             '{}{}/pal-park-area/{}/'.format(TEST_HOST, API_V2, pal_park.pal_park_area.pk))
 
+    def test_pokemon_species_varieties_query_count(self):
+
+        # Varieties are summaries, rendering them must not cost queries per variety
+        def query_count(pokemon_species):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(
+                    '{}/pokemon-species/{}/'.format(API_V2, pokemon_species.pk))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(context.captured_queries), response.data['varieties']
+
+        few_species = self.setup_pokemon_species_data(name='pkmn spcs with few vrts')
+        self.setup_pokemon_data(
+            pokemon_species=few_species, name='pkmn vrty for few', is_default=True)
+
+        many_species = self.setup_pokemon_species_data(name='pkmn spcs with many vrts')
+        for index in range(0, 4):
+            self.setup_pokemon_data(
+                pokemon_species=many_species, name='pkmn vrty ' + str(index) + ' for many',
+                is_default=index == 0)
+
+        few_count, few_varieties = query_count(few_species)
+        many_count, many_varieties = query_count(many_species)
+
+        self.assertEqual(few_count, many_count)
+        self.assertEqual(len(many_varieties), 4)
+        self.assertEqual(
+            [variety['is_default'] for variety in many_varieties], [True, False, False, False])
+
     def test_pokemon_api(self):
 
         pokemon_species = self.setup_pokemon_species_data(name='pkmn spcs for base pkmn')
@@ -4127,8 +4227,6 @@ class APITests(APIData, APITestCase):
         response = self.client.get(
             '{}/pokemon/{}/'.format(API_V2, pokemon.pk), HTTP_HOST='testserver')
 
-        sprites_data = json.loads(pokemon_sprites.sprites)
-
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
         # base params
@@ -4247,9 +4345,135 @@ class APITests(APIData, APITestCase):
         # sprite params
         self.assertEqual(
             response.data['sprites']['front_default'],
-            '{}{}'.format(MEDIA_HOST, sprites_data['front_default'].replace('/media/', '')))
+            '{}sprites/{}'.format(MEDIA_HOST, pokemon_sprites.front_default))
         self.assertEqual(response.data['sprites']['back_default'], None)
 
+    def test_pokemon_moves_query_count(self):
+
+        # The number of queries for a pokemon's moves must not grow with the
+        # number of moves, version groups or learn methods it has
+        def query_count(pokemon):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get('{}/pokemon/{}/'.format(API_V2, pokemon.pk))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(context.captured_queries), response.data['moves']
+
+        version_group = self.setup_version_group_data(name='ver grp for pkmn mvs')
+
+        few_pokemon = self.setup_pokemon_data(name='pkmn with few mvs')
+        self.setup_pokemon_sprites_data(pokemon=few_pokemon)
+        self.setup_pokemon_move_data(
+            pokemon=few_pokemon, move=self.setup_move_data(name='mv 0 for few pkmn mvs'),
+            version_group=version_group)
+
+        many_pokemon = self.setup_pokemon_data(name='pkmn with many mvs')
+        self.setup_pokemon_sprites_data(pokemon=many_pokemon)
+        for index in range(0, 5):
+            move = self.setup_move_data(name='mv ' + str(index) + ' for many pkmn mvs')
+            for level in range(0, 3):
+                self.setup_pokemon_move_data(
+                    pokemon=many_pokemon, move=move, level=level,
+                    version_group=self.setup_version_group_data(
+                        name='ver grp ' + str(index) + str(level) + ' for pkmn mvs'))
+
+        load_reference_tables()
+        few_count, few_moves = query_count(few_pokemon)
+        many_count, many_moves = query_count(many_pokemon)
+
+        self.assertEqual(few_count, many_count)
+        self.assertEqual(len(few_moves), 1)
+        self.assertEqual(len(many_moves), 5)
+        self.assertEqual(
+            [len(move['version_group_details']) for move in many_moves], [3] * 5)
+
+    def test_pokemon_encounters_api(self):
+
+        few_pokemon = self.setup_pokemon_data(name='pkmn with few encntrs')
+        many_pokemon = self.setup_pokemon_data(name='pkmn with many encntrs')
+        encounter_method = self.setup_encounter_method_data(name='encntr mthd for pkmn encntrs')
+        encounter_condition = self.setup_encounter_condition_data(
+            name='encntr cndtn for pkmn encntrs')
+        encounter_condition_value = self.setup_encounter_condition_value_data(
+            encounter_condition, name='encntr-cndtn-vlu-for-pkmn-encntrs')
+        versions = [
+            self.setup_version_data(name='ver ' + str(index) + ' for pkmn encntrs')
+            for index in range(0, 2)
+        ]
+        location_areas = [
+            self.setup_location_area_data(name='lctn area ' + str(index) + ' for pkmn encntrs')
+            for index in range(0, 3)
+        ]
+
+        for slot in range(0, 2):
+            encounter = self.setup_encounter_data(
+                location_area=location_areas[0], pokemon=few_pokemon, version=versions[0],
+                encounter_slot=self.setup_encounter_slot_data(
+                    encounter_method, slot=slot, rarity=10 + slot),
+                min_level=slot, max_level=slot + 5)
+
+        self.setup_encounter_condition_value_map_data(encounter, encounter_condition_value)
+
+        for location_area in location_areas:
+            for version in versions[:1] if location_area == location_areas[0] else versions:
+                for slot in range(0, 3):
+                    self.setup_encounter_data(
+                        location_area=location_area, pokemon=many_pokemon, version=version,
+                        encounter_slot=self.setup_encounter_slot_data(
+                            encounter_method, slot=slot, rarity=20))
+
+        def encounters(pokemon):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(
+                    '{}/pokemon/{}/encounters'.format(API_V2, pokemon.pk))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(context.captured_queries), response.data
+
+        load_reference_tables()
+        few_count, few_data = encounters(few_pokemon)
+        many_count, many_data = encounters(many_pokemon)
+
+        # the number of queries doesn't depend on the number of encounters
+        self.assertEqual(few_count, many_count)
+
+        self.assertEqual(len(few_data), 1)
+        self.assertEqual(len(many_data), 3)
+        self.assertEqual(
+            [len(area['version_details']) for area in many_data], [1, 2, 2])
+        # location area params
+        self.assertEqual(few_data[0]['location_area']['name'], location_areas[0].name)
+        self.assertEqual(
+            few_data[0]['location_area']['url'],
+            '{}{}/location-area/{}/'.format(TEST_HOST, API_V2, location_areas[0].pk))
+        # version params
+        version_details = few_data[0]['version_details'][0]
+        self.assertEqual(version_details['version']['name'], versions[0].name)
+        self.assertEqual(
+            version_details['version']['url'],
+            '{}{}/version/{}/'.format(TEST_HOST, API_V2, versions[0].pk))
+        self.assertEqual(version_details['max_chance'], 21)
+        self.assertEqual(many_data[1]['version_details'][1]['max_chance'], 60)
+        # encounter params
+        encounter_details = version_details['encounter_details']
+        self.assertEqual(len(encounter_details), 2)
+        self.assertEqual(encounter_details[1]['min_level'], encounter.min_level)
+        self.assertEqual(encounter_details[1]['max_level'], encounter.max_level)
+        self.assertEqual(encounter_details[1]['chance'], encounter.encounter_slot.rarity)
+        self.assertEqual(encounter_details[1]['method']['name'], encounter_method.name)
+        self.assertEqual(
+            encounter_details[1]['method']['url'],
+            '{}{}/encounter-method/{}/'.format(TEST_HOST, API_V2, encounter_method.pk))
+        self.assertEqual(encounter_details[0]['condition_values'], [])
+        self.assertEqual(
+            encounter_details[1]['condition_values'][0]['name'], encounter_condition_value.name)
+        self.assertEqual(
+            encounter_details[1]['condition_values'][0]['url'],
+            '{}{}/encounter-condition-value/{}/'.format(
+                TEST_HOST, API_V2, encounter_condition_value.pk))
+
+        response = self.client.get(
+            '{}/pokemon/{}/encounters'.format(API_V2, many_pokemon.pk + 1))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_pokemon_form_api(self):
 
         pokemon_species = self.setup_pokemon_species_data()
@@ -4257,8 +4481,6 @@ class APITests(APIData, APITestCase):
         pokemon_form = self.setup_pokemon_form_data(pokemon=pokemon, name='pkm form for base pkmn')
         pokemon_form_sprites = self.setup_pokemon_form_sprites_data(pokemon_form)
 
-        sprites_data = json.loads(pokemon_form_sprites.sprites)
-
         response = self.client.get(
             '{}/pokemon-form/{}/'.format(API_V2, pokemon_form.pk), HTTP_HOST='testserver')
 
@@ -4286,7 +4508,7 @@ class APITests(APIData, APITestCase):
         # sprite params
         self.assertEqual(
             response.data['sprites']['front_default'],
-            '{}{}'.format(MEDIA_HOST, sprites_data['front_default'].replace('/media/', '')))
+            '{}sprites/{}'.format(MEDIA_HOST, pokemon_form_sprites.front_default))
         self.assertEqual(response.data['sprites']['back_default'], None)
 
     # Evolution test
@@ -4434,6 +4656,28 @@ class APITests(APIData, APITestCase):
             stage_two_second_data['evolution_details'][0]['party_type']['url'],
             '{}{}/type/{}/'.format(TEST_HOST, API_V2, stage_two_second_party_type.pk))
 
+        # the trees stored by the build give the same response
+        # without going through the species of the chain
+        EvolutionChainSummary.objects.bulk_create(
+            evolution_chain_summaries([evolution_chain.pk]))
+
+        with CaptureQueriesContext(connection) as context:
+            summary_response = self.client.get(
+                '{}/evolution-chain/{}/'.format(API_V2, evolution_chain.pk))
+
+        self.assertEqual(summary_response.content, response.content)
+        for query in context.captured_queries:
+            self.assertNotIn('pokemon_v2_pokemonevolution"', query['sql'])
+
+        # and the chain of any of its species is a sub-resource of the species
+        species_response = self.client.get(
+            '{}/pokemon-species/{}/evolution-chain/'.format(API_V2, stage_two_first.pk))
+        self.assertEqual(species_response.content, response.content)
+
+        response = self.client.get(
+            '{}/pokemon-species/{}/evolution-chain/'.format(API_V2, stage_two_first.pk + 100))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     # Encounter Tests
     def test_encounter_method_api(self):
 
@@ -4551,3 +4795,654 @@ class APITests(APIData, APITestCase):
         self.assertEqual(
             response.data['pokemon_encounters'][0]['pokemon_species']['url'],
             '{}{}/pokemon-species/{}/'.format(TEST_HOST, API_V2, pokemon_species.pk))
+
+    # Snapshot Tests
+    def test_snapshot_api(self):
+
+        for index in range(0, 3):
+            ability = self.setup_ability_data(name='ablty-' + str(index))
+            self.setup_ability_name_data(ability, name='ablty nm ' + str(index))
+
+        artifacts_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, artifacts_dir)
+
+        urls = [
+            '{}/ability/'.format(API_V2),
+            '{}/ability/?limit=1&offset=1'.format(API_V2),
+            '{}/ability/{}/'.format(API_V2, ability.pk),
+        ]
+
+        with override_settings(BUILD_ARTIFACTS_DIR=artifacts_dir, SNAPSHOT_MODE=True):
+
+            expected = [self.client.get(url).content for url in urls]
+
+            write_resource(new_snapshot(1), AbilityResource, 'ability')
+            publish_generation(1)
+
+            # snapshot responses never reach the database
+            with self.assertNumQueries(0):
+                actual = [self.client.get(url).content for url in urls]
+                by_name = self.client.get('{}/ability/{}/'.format(API_V2, ability.name))
+
+            self.assertEqual(expected, actual)
+            self.assertEqual(by_name.content, expected[2])
+            self.assertEqual(
+                json.loads(actual[2].decode())['names'][0]['language']['url'],
+                '{}{}/language/{}/'.format(
+                    TEST_HOST, API_V2, ability.abilityname.get().language.pk))
+
+            # anything the snapshot can't answer goes through the serializers
+            response = self.client.get(
+                '{}/ability/{}/'.format(API_V2, ability.pk),
+                {'lang': ability.abilityname.get().language.name})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['name'], ability.name)
+
+    # Sprite Tests
+    def test_sprite_manifest(self):
+
+        artifacts_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, artifacts_dir)
+        sprites_dir = os.path.join(artifacts_dir, 'sprites')
+
+        for path in ('items/potion.png', 'pokemon/1.png', 'pokemon/shiny/1.png'):
+            os.makedirs(os.path.dirname(os.path.join(sprites_dir, path)), exist_ok=True)
+            open(os.path.join(sprites_dir, path), 'wb').close()
+
+        with override_settings(BUILD_ARTIFACTS_DIR=artifacts_dir, SPRITES_DIR=sprites_dir):
+
+            self.assertEqual(
+                sprite_manifest(), {'items/potion.png', 'pokemon/1.png', 'pokemon/shiny/1.png'})
+            self.assertTrue(os.path.exists(os.path.join(artifacts_dir, 'sprite-manifest.json')))
+
+            # a new file changes the mtime of its directory
+            open(os.path.join(sprites_dir, 'pokemon/shiny/2.png'), 'wb').close()
+            os.utime(os.path.join(sprites_dir, 'pokemon/shiny'), ns=(0, 0))
+            self.assertIn('pokemon/shiny/2.png', sprite_manifest())
+
+        # pointing SPRITES_DIR somewhere else replaces the manifest, in memory and on disk
+        other_sprites_dir = os.path.join(artifacts_dir, 'other-sprites')
+        os.makedirs(os.path.join(other_sprites_dir, 'pokemon'))
+        open(os.path.join(other_sprites_dir, 'pokemon/2.png'), 'wb').close()
+
+        with override_settings(BUILD_ARTIFACTS_DIR=artifacts_dir, SPRITES_DIR=other_sprites_dir):
+
+            self.assertEqual(sprite_manifest(), {'pokemon/2.png'})
+
+            with open(os.path.join(artifacts_dir, 'sprite-manifest.json'), 'rt') as manifest:
+                self.assertEqual(json.load(manifest)['root'], other_sprites_dir)
+
+        with override_settings(BUILD_ARTIFACTS_DIR=artifacts_dir, SPRITES_DIR=sprites_dir):
+            self.assertIn('pokemon/1.png', sprite_manifest())
+
+    # Registry Tests
+    def test_reference_registry(self):
+
+        ability = self.setup_ability_data(name='ablty for rgstry')
+        ability_name = self.setup_ability_name_data(ability, name='ablty nm for rgstry')
+        language = ability_name.language
+        url = '{}/ability/{}/'.format(API_V2, ability.pk)
+
+        # the first request loads the languages, later ones don't touch the table
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+
+        for query in context.captured_queries:
+            self.assertNotIn('pokemon_v2_language"', query['sql'])
+        self.assertEqual(response.data['names'][0]['language']['name'], language.name)
+        self.assertEqual(
+            response.data['names'][0]['language']['url'],
+            '{}{}/language/{}/'.format(TEST_HOST, API_V2, language.pk))
+
+        # saving a row drops its table
+        language.name = 'rnmd lang for rgstry'
+        language.save()
+
+        response = self.client.get(url)
+        self.assertEqual(response.data['names'][0]['language']['name'], language.name)
+
+        # URLs follow the host of the request
+        response = self.client.get(url, HTTP_HOST='localhost')
+        self.assertEqual(
+            response.data['names'][0]['language']['url'],
+            'http://localhost{}/language/{}/'.format(API_V2, language.pk))
+
+        # and so does ?format=
+        response = self.client.get(url + '?format=json')
+        self.assertEqual(
+            response.data['names'][0]['language']['url'],
+            '{}{}/language/{}/?format=json'.format(TEST_HOST, API_V2, language.pk))
+
+
+    def test_summary_urls(self):
+
+        generation = self.setup_generation_data(name='gen for smry urls')
+        generation_name = self.setup_generation_name_data(generation, name='gen nm for smry urls')
+        url = '{}/generation/{}/'.format(API_V2, generation.pk)
+
+        response = self.client.get(url)
+        self.assertEqual(
+            response.data['main_region']['url'],
+            '{}{}/region/{}/'.format(TEST_HOST, API_V2, generation.region.pk))
+
+        # the host, scheme and ?format= of the request are kept
+        response = self.client.get(url + '?format=json', HTTP_HOST='localhost:8000', secure=True)
+        self.assertEqual(
+            response.data['main_region']['url'],
+            'https://localhost:8000{}/region/{}/?format=json'.format(
+                API_V2, generation.region.pk))
+        self.assertEqual(
+            response.data['names'][0]['language']['url'],
+            'https://localhost:8000{}/language/{}/?format=json'.format(
+                API_V2, generation_name.language.pk))
+
+    def test_query_plan(self):
+
+        ability = self.setup_ability_data(name='ablty for qry pln')
+        self.setup_ability_name_data(ability, name='ablty nm for qry pln')
+
+        # the generation is joined in rather than fetched on its own
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('{}/ability/{}/'.format(API_V2, ability.pk))
+
+        for query in context.captured_queries:
+            self.assertNotIn('FROM "pokemon_v2_generation"', query['sql'])
+        self.assertEqual(response.data['generation']['name'], ability.generation.name)
+        self.assertEqual(response.data['names'][0]['name'], 'ablty nm for qry pln')
+
+        url = '{}/debug/query-plan/ability/'.format(API_V2)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        with override_settings(DEBUG=True):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['list']['select_related'], [])
+            self.assertEqual(response.data['detail']['select_related'], ['generation'])
+            self.assertIn('abilityname', response.data['detail']['prefetch_related'])
+
+            response = self.client.get('{}/debug/query-plan/nothing/'.format(API_V2))
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_sparse_fieldsets(self):
+
+        pokemon = self.setup_pokemon_data(name='pkmn for fldsts')
+        pokemon_stat = self.setup_pokemon_stat_data(pokemon, base_stat=15)
+        pokemon_type = self.setup_pokemon_type_data(pokemon)
+        url = '{}/pokemon/{}/'.format(API_V2, pokemon.pk)
+
+        # fields left out never run their queries
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url + '?fields=name,stats.base_stat,types.type.name')
+
+        for query in context.captured_queries:
+            self.assertNotIn('FROM "pokemon_v2_pokemonmove"', query['sql'])
+        self.assertEqual(list(response.data), ['name', 'stats', 'types'])
+        self.assertEqual(response.data['stats'], [{'base_stat': pokemon_stat.base_stat}])
+        self.assertEqual(response.data['types'], [{'type': {'name': pokemon_type.type.name}}])
+
+        response = self.client.get(url + '?exclude=moves,sprites,stats.effort,types')
+        self.assertNotIn('moves', response.data)
+        self.assertNotIn('types', response.data)
+        self.assertEqual(response.data['stats'][0]['base_stat'], pokemon_stat.base_stat)
+        self.assertNotIn('effort', response.data['stats'][0])
+        self.assertEqual(response.data['name'], pokemon.name)
+
+        response = self.client.get('{}/pokemon/?fields=name'.format(API_V2))
+        self.assertEqual(response.data['results'][0], {'name': pokemon.name})
+
+        response = self.client.get(url + '?fields=name,stats.nothing')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['fields'], 'Unknown field "stats.nothing".')
+
+    def test_language_filter(self):
+
+        ability = self.setup_ability_data(name='ablty for lang fltr')
+        self.setup_ability_name_data(ability, name='ablty nm for lang fltr')
+        ability_name = self.setup_ability_name_data(ability, name='othr ablty nm for lang fltr')
+        language = ability_name.language
+        url = '{}/ability/{}/'.format(API_V2, ability.pk)
+
+        # with the filter in the query fetching the names
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {'lang': language.name})
+
+        name_queries = [
+            query['sql'] for query in context.captured_queries
+            if 'FROM "pokemon_v2_abilityname"' in query['sql']]
+        self.assertEqual(len(name_queries), 1)
+        self.assertIn(
+            '"pokemon_v2_abilityname"."language_id" = %s' % language.pk, name_queries[0])
+
+        # by name or id
+        for lang in (language.name, language.pk):
+            response = self.client.get(url, {'lang': lang})
+            self.assertEqual(len(response.data['names']), 1)
+            self.assertEqual(response.data['names'][0]['name'], ability_name.name)
+            self.assertEqual(response.data['names'][0]['language']['name'], language.name)
+
+        response = self.client.get(url)
+        self.assertEqual(len(response.data['names']), 2)
+
+        # localized entries of SerializerMethodFields
+        pokemon_species = self.setup_pokemon_species_data(name='pkmn spcs for lang fltr')
+        self.setup_pokemon_species_name_data(pokemon_species, name='pkmn spcs nm for lang fltr')
+        pokemon_species_name = self.setup_pokemon_species_name_data(
+            pokemon_species, name='othr pkmn spcs nm for lang fltr')
+
+        response = self.client.get(
+            '{}/pokemon-species/{}/'.format(API_V2, pokemon_species.pk),
+            {'lang': pokemon_species_name.language.name})
+        self.assertEqual(
+            [name['name'] for name in response.data['names']], [pokemon_species_name.name])
+        self.assertEqual(len(response.data['genera']), 1)
+
+        response = self.client.get(url, {'lang': 'nothing'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_pokemon_moves_api(self):
+
+        pokemon = self.setup_pokemon_data(name='pkmn for mvs')
+        self.setup_pokemon_sprites_data(pokemon)
+        version_group = self.setup_version_group_data(name='ver grp for pkmn mvs')
+        other_version_group = self.setup_version_group_data(name='othr ver grp for pkmn mvs')
+        moves = [self.setup_move_data(name='mv {} for pkmn mvs'.format(i)) for i in range(3)]
+
+        for move in moves:
+            self.setup_pokemon_move_data(pokemon, move, other_version_group, level=1)
+        self.setup_pokemon_move_data(pokemon, moves[1], version_group, level=5)
+
+        # ?version_group= on the pokemon
+        response = self.client.get(
+            '{}/pokemon/{}/'.format(API_V2, pokemon.pk), {'version_group': version_group.name})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['moves']), 1)
+        self.assertEqual(response.data['moves'][0]['move']['name'], moves[1].name)
+        self.assertEqual(
+            response.data['moves'][0]['version_group_details'],
+            [{
+                'level_learned_at': 5,
+                'version_group': {
+                    'name': version_group.name,
+                    'url': '{}{}/version-group/{}/'.format(TEST_HOST, API_V2, version_group.pk)
+                },
+                'move_learn_method': response.data['moves'][0]['version_group_details'][0][
+                    'move_learn_method']
+            }])
+
+        full = self.client.get('{}/pokemon/{}/'.format(API_V2, pokemon.pk)).data['moves']
+        self.assertEqual(len(full), 3)
+
+        # the sub-resource pages through the same entries
+        url = '{}/pokemon/{}/moves/'.format(API_V2, pokemon.pk)
+        response = self.client.get(url, {'limit': 2})
+        self.assertEqual(response.data['count'], 3)
+        results = response.data['results']
+        results += self.client.get(response.data['next']).data['results']
+        self.assertEqual(results, full)
+
+        response = self.client.get(url, {'version_group': version_group.pk})
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['move']['name'], moves[1].name)
+
+        response = self.client.get(url, {'version_group': 'nothing'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get('{}/pokemon/{}/moves/'.format(API_V2, pokemon.pk + 1000))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_batch_api(self):
+
+        abilities = [self.setup_ability_data(name='ablty-{}-for-btch'.format(i)) for i in range(3)]
+        for ability in abilities:
+            self.setup_ability_name_data(ability, name='nm for ' + ability.name)
+
+        lookups = [
+            str(abilities[2].pk), abilities[0].name, str(abilities[2].pk + 1000), 'bad!',
+            str(abilities[1].pk)]
+
+        # one query for the abilities and one per prefetched relation
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                '{}/ability/'.format(API_V2), {'ids': ','.join(lookups)})
+
+        name_queries = [
+            query for query in context.captured_queries
+            if 'FROM "pokemon_v2_abilityname"' in query['sql']]
+        self.assertEqual(len(name_queries), 1)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], len(lookups))
+
+        results = response.data['results']
+        for index, ability in ((0, abilities[2]), (1, abilities[0]), (4, abilities[1])):
+            self.assertEqual(
+                results[index],
+                self.client.get('{}/ability/{}/'.format(API_V2, ability.pk)).data)
+        for index in (2, 3):
+            self.assertEqual(results[index]['lookup'], lookups[index])
+            self.assertEqual(results[index]['status'], 404)
+
+        response = self.client.get(
+            '{}/ability/'.format(API_V2), {'ids': ','.join(['1'] * 101)})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_generation_etags(self):
+
+        ability = self.setup_ability_data(name='ablty for etgs')
+        self.setup_ability_name_data(ability, name='ablty nm for etgs')
+        pokemon = self.setup_pokemon_data(name='pkmn for etgs')
+        url = '{}/ability/{}/'.format(API_V2, ability.pk)
+        encounters_url = '{}/pokemon/{}/encounters'.format(API_V2, pokemon.pk)
+
+        artifacts_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, artifacts_dir)
+
+        with override_settings(BUILD_ARTIFACTS_DIR=artifacts_dir):
+
+            # nothing to tag responses with until a build is published
+            response = self.client.get(url)
+            self.assertNotIn('ETag', response)
+
+            publish_generation(3)
+
+            response = self.client.get(url)
+            etag = response['ETag']
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(etag.startswith('"3-'))
+            self.assertIn('max-age=', response['Cache-Control'])
+            self.assertNotEqual(self.client.get(url + '?fields=name')['ETag'], etag)
+
+            # the order of query params doesn't matter
+            reordered_etag = self.client.get(url + '?fields=id,name&exclude=id')['ETag']
+            response = self.client.get(
+                url + '?exclude=id&fields=id,name', HTTP_IF_NONE_MATCH=reordered_etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+            # requests which have the current ETag never reach the database
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response['ETag'], etag)
+
+            encounters_etag = self.client.get(encounters_url)['ETag']
+            with self.assertNumQueries(0):
+                response = self.client.get(encounters_url, HTTP_IF_NONE_MATCH=encounters_etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+            # a new build makes them stale
+            publish_generation(4)
+
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response['ETag'].startswith('"4-'))
+
+    def test_response_cache(self):
+
+        ability = self.setup_ability_data(name='ablty for rspns cch')
+        url = '{}/ability/{}/'.format(API_V2, ability.pk)
+
+        artifacts_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, artifacts_dir)
+
+        caches = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+        with override_settings(BUILD_ARTIFACTS_DIR=artifacts_dir, CACHES=caches,
+                               RESPONSE_CACHE='default'):
+
+            # nothing is cached before a build is published
+            self.assertNotIn('X-Cache', self.client.get(url))
+
+            publish_generation(1)
+
+            response = self.client.get(url)
+            self.assertEqual(response['X-Cache'], 'MISS')
+
+            with self.assertNumQueries(0):
+                cached = self.client.get(url)
+            self.assertEqual(cached['X-Cache'], 'HIT')
+            self.assertEqual(cached.content, response.content)
+            self.assertEqual(cached['ETag'], response['ETag'])
+            self.assertEqual(cached['Content-Type'], response['Content-Type'])
+
+            self.assertEqual(
+                self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code,
+                status.HTTP_304_NOT_MODIFIED)
+
+            # the order of query params doesn't matter
+            self.assertEqual(self.client.get(url + '?fields=id&lang=1')['X-Cache'], 'MISS')
+            self.assertEqual(self.client.get(url + '?lang=1&fields=id')['X-Cache'], 'HIT')
+
+            # while another worker renders the new generation, the previous one is served
+            publish_generation(2)
+            request = self.client.get(url).wsgi_request
+            cache = response_cache()
+            cache.delete(response_key(request, 2))
+            cache.add(response_key(request, 2) + ':lock', 'other worker')
+
+            stale = self.client.get(url)
+            self.assertEqual(stale['X-Cache'], 'STALE')
+            self.assertEqual(stale.content, response.content)
+
+            # without one, waited for while the other worker fills it
+            cache.delete(response_key(request, 1))
+
+            def fill(seconds):
+                cache.set(response_key(request, 2), ([], b'filled'))
+
+            hits = response_cache_stats()['hits']
+            with mock.patch('pokemon_v2.response_cache.time.sleep', side_effect=fill):
+                waited = self.client.get(url)
+            self.assertEqual(waited['X-Cache'], 'HIT')
+            self.assertEqual(waited.content, b'filled')
+            self.assertEqual(response_cache_stats()['hits'], hits + 1)
+
+            # and rendered here as well if that takes too long
+            cache.delete(response_key(request, 2))
+            with mock.patch('pokemon_v2.response_cache.LOCK_WAIT', 0.1):
+                self.assertNotIn('X-Cache', self.client.get(url))
+
+            cache.delete(response_key(request, 2) + ':lock')
+            self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+            with override_settings(DEBUG=True):
+                stats = self.client.get('{}/debug/response-cache/'.format(API_V2)).data
+            self.assertGreaterEqual(stats['hits'], 2)
+            self.assertGreaterEqual(stats['stale'], 1)
+            self.assertGreaterEqual(stats['fills'], 2)
+
+    def test_response_cache_local_tier(self):
+
+        # least recently used entries go first once over budget
+        tier = LocalTier(max_bytes=100)
+        entry = ([], b'x' * 30)
+
+        for key in ('a', 'b', 'c'):
+            tier.set(key, entry, None)
+        tier.get('a', None)
+        tier.set('d', entry, None)
+
+        self.assertEqual(list(tier.entries), ['c', 'a', 'd'])
+        self.assertEqual(tier.size, 93)
+
+        tier.set('e', ([], b'x' * 100), None)
+        self.assertNotIn('e', tier.entries)
+
+        # and all of them with a new generation
+        self.assertIsNone(tier.get('a', 1))
+        self.assertEqual(tier.size, 0)
+
+        ability = self.setup_ability_data(name='ablty for lcl tr')
+        url = '{}/ability/{}/'.format(API_V2, ability.pk)
+
+        artifacts_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, artifacts_dir)
+
+        caches = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+        with override_settings(BUILD_ARTIFACTS_DIR=artifacts_dir, CACHES=caches,
+                               RESPONSE_CACHE='default', RESPONSE_CACHE_LOCAL_BYTES=1024 * 1024):
+
+            publish_generation(1)
+
+            response = self.client.get(url)
+            self.assertEqual(response['X-Cache'], 'MISS')
+
+            # served from memory without going to the shared cache
+            response_cache().clear()
+            local_hits = response_cache_stats()['local_hits']
+
+            with self.assertNumQueries(0):
+                cached = self.client.get(url)
+            self.assertEqual(cached['X-Cache'], 'HIT')
+            self.assertEqual(cached.content, response.content)
+            self.assertEqual(response_cache_stats()['local_hits'], local_hits + 1)
+
+            # until the next generation
+            publish_generation(2)
+            self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+            self.assertEqual(local_tier().generation, 2)
+
+            stats = response_cache_stats()
+            self.assertGreater(stats['local_hit_ratio'], 0)
+            self.assertGreater(stats['local_bytes'], len(response.content))
+
+    def test_query_cache(self):
+
+        ability = self.setup_ability_data(name='ablty for qry cch')
+        url = '{}/ability/{}/'.format(API_V2, ability.pk)
+
+        artifacts_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, artifacts_dir)
+
+        caches = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                              'LOCATION': 'query-cache'}}
+
+        with override_settings(BUILD_ARTIFACTS_DIR=artifacts_dir, CACHES=caches,
+                               FROZEN_DATA=True, QUERY_CACHE='default', RESPONSE_CACHE=None):
+
+            install_query_cache()
+            self.addCleanup(uninstall_query_cache)
+
+            # nothing is cached before a build is published
+            with self.assertNumQueries(1):
+                Ability.objects.get(pk=ability.pk)
+            with self.assertNumQueries(1):
+                Ability.objects.get(pk=ability.pk)
+
+            publish_generation(1)
+
+            for query in (
+                    lambda: Ability.objects.get(pk=ability.pk).name,
+                    lambda: list(Ability.objects.filter(pk__gte=ability.pk).values_list('id')),
+                    lambda: Ability.objects.filter(pk=ability.pk).count(),
+                    lambda: Ability.objects.filter(pk=-1).first()):
+
+                with self.assertNumQueries(1):
+                    result = query()
+                with self.assertNumQueries(0):
+                    self.assertEqual(query(), result)
+
+            with self.assertNumQueries(0):
+                self.assertEqual(list(Ability.objects.none()), [])
+
+            # only the tables of the build are cached
+            for _ in range(2):
+                with self.assertNumQueries(1):
+                    ContentType.objects.filter(app_label='pokemon_v2').count()
+
+            # writes go through
+            self.assertEqual(Ability.objects.filter(pk=ability.pk).update(is_main_series=True), 1)
+
+            response = self.client.get(url)
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url).content, response.content)
+
+            # a new generation runs them again
+            publish_generation(2)
+            with self.assertNumQueries(1):
+                Ability.objects.get(pk=ability.pk)
+
+    def test_cache_compression(self):
+
+        ability = self.setup_ability_data(name='ablty for cmprssn')
+
+        artifacts_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, artifacts_dir)
+
+        with override_settings(BUILD_ARTIFACTS_DIR=artifacts_dir):
+
+            path = new_snapshot(1)
+            write_resource(path, AbilityResource, 'ability')
+
+            samples = snapshot_samples(path, 10, 'https://pokeapi.co')
+            self.assertIn(ability.pk, [json.loads(sample.decode())['id'] for sample in samples])
+
+            # with the URLs of the origin they're served from
+            self.assertNotIn(b'snapshot.pokeapi.co', b''.join(samples))
+            self.assertEqual(
+                json.loads(samples[0].decode())['generation']['url'][:len('https://pokeapi.co/')],
+                'https://pokeapi.co/')
+
+            if compression.zstandard is None:
+                self.assertIsNone(compression.train_dictionary(1, path))
+                with self.assertRaises(ImproperlyConfigured):
+                    compression.ZstdCompressor({})
+
+    @skipUnless(compression.zstandard, 'zstandard is not installed')
+    def test_zstd_compression(self):
+
+        for index in range(30):
+            self.setup_ability_data(name='ablty {} for zstd'.format(index))
+
+        artifacts_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, artifacts_dir)
+
+        params = {'OPTIONS': {
+            'CLIENT_CLASS': 'pokemon_v2.compression.CompressedClient',
+            'COMPRESSOR': 'pokemon_v2.compression.ZstdCompressor'}}
+
+        # Stands in for the Redis connection, the client is handed it on every call
+        class Connection(dict):
+            def mget(self, *keys):
+                return [self.get(key) for key in keys]
+
+        with override_settings(BUILD_ARTIFACTS_DIR=artifacts_dir), \
+                mock.patch('pokemon_v2.compression.DICTIONARY_SIZE', 4096):
+
+            path = new_snapshot(1)
+            write_resource(path, AbilityResource, 'ability')
+            self.assertIsNotNone(compression.train_dictionary(1, path))
+            publish_generation(1)
+
+            client = RedisCache('redis://localhost:6379/1', params).client
+            connection = Connection()
+            samples = snapshot_samples(path, 10, TEST_HOST)
+
+            for index, sample in enumerate(samples):
+                connection[client.make_key(index)] = client.encode(sample)
+            connection[client.make_key('short')] = client.encode(b'short')
+
+            # compressed with the dictionary of the generation, and read back
+            value = connection[client.make_key(0)]
+            self.assertNotEqual(compression.zstandard.get_frame_parameters(value).dict_id, 0)
+            self.assertEqual(client.get(0, client=connection), samples[0])
+            self.assertEqual(client.get('short', client=connection), b'short')
+            self.assertEqual(
+                client.get_many(range(len(samples)), client=connection),
+                dict(enumerate(samples)))
+
+            # values compressed with a pruned dictionary read as misses
+            compression.prune_dictionaries(1 + compression.KEPT_DICTIONARIES)
+            self.assertFalse(os.path.exists(compression.dictionary_path(1)))
+
+            client = RedisCache('redis://localhost:6379/1', params).client
+            self.assertEqual(client.get(0, default='missing', client=connection), 'missing')
+            self.assertEqual(client.get_many([0, 'short'], client=connection), {'short': b'short'})
+
+            # without listing the dictionaries again until they change
+            with mock.patch('pokemon_v2.compression.os.listdir') as listdir:
+                self.assertIsNone(client.get(1, client=connection))
+            listdir.assert_not_called()
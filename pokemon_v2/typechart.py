@@ -0,0 +1,105 @@
+from collections import OrderedDict
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .generation import current_generation
+from .models import Type, TypeEfficacy
+
+# The type chart is the TypeEfficacy table held in memory as a dense matrix of
+# damage factors, indexed by type. It is loaded once per process and reloaded
+# when a new build generation is published, or when a type or efficacy is saved
+# through the ORM in this process.
+#
+# Damage factors are percentages, as in TypeEfficacy: 0, 50, 100 or 200 for a
+# single type, and their product (0, 25, 50, 100, 200 or 400) for dual types.
+# Pairs without a TypeEfficacy row deal normal damage.
+
+NORMAL_DAMAGE = 100
+
+_chart = {'generation': None, 'chart': None}
+
+
+class TypeChart():
+
+    def __init__(self, types, efficacies):
+        """
+        types are (id, name) pairs and efficacies are (damage_type_id, target_type_id,
+        damage_factor) triples, in the order relations should be listed in.
+        """
+
+        self.names = OrderedDict(types)
+        self.ids_by_name = {name: type_id for type_id, name in self.names.items()}
+        self.index = {type_id: index for index, type_id in enumerate(self.names)}
+
+        self.factors = [[NORMAL_DAMAGE] * len(self.index) for type_id in self.index]
+        self.damage_to = {}
+        self.damage_from = {}
+
+        for damage_type_id, target_type_id, damage_factor in efficacies:
+            self.factors[self.index[damage_type_id]][self.index[target_type_id]] = damage_factor
+            self.damage_to.setdefault(damage_type_id, []).append((target_type_id, damage_factor))
+            self.damage_from.setdefault(target_type_id, []).append((damage_type_id, damage_factor))
+
+    def lookup(self, type_id_or_name):
+        """
+        Returns the id of a type given its id or name, or None if there is no such type.
+        """
+
+        if type_id_or_name.isdigit() and int(type_id_or_name) in self.index:
+            return int(type_id_or_name)
+
+        return self.ids_by_name.get(type_id_or_name)
+
+    def damage_factor(self, damage_type_id, target_type_ids):
+        """
+        Returns the damage factor of a damage type against a set of target types.
+        """
+
+        factors = self.factors[self.index[damage_type_id]]
+        damage_factor = NORMAL_DAMAGE
+
+        for target_type_id in target_type_ids:
+            damage_factor = damage_factor * factors[self.index[target_type_id]] // NORMAL_DAMAGE
+
+        return damage_factor
+
+    def matchups(self, damage_type_ids, target_type_id_sets):
+        """
+        Returns the damage factor of every damage type against every set of
+        target types, as one row per damage type.
+        """
+
+        return [
+            [self.damage_factor(damage_type_id, target_type_ids)
+             for target_type_ids in target_type_id_sets]
+            for damage_type_id in damage_type_ids]
+
+
+def load_type_chart():
+
+    types = Type.objects.order_by('id').values_list('id', 'name')
+    efficacies = (TypeEfficacy.objects
+                  .filter(damage_type__isnull=False, target_type__isnull=False)
+                  .order_by('id')
+                  .values_list('damage_type_id', 'target_type_id', 'damage_factor'))
+
+    return TypeChart(list(types), list(efficacies))
+
+
+def type_chart():
+
+    generation = current_generation()
+
+    if _chart['chart'] is None or _chart['generation'] != generation:
+        _chart['chart'] = load_type_chart()
+        _chart['generation'] = generation
+
+    return _chart['chart']
+
+
+@receiver(post_save, sender=Type)
+@receiver(post_delete, sender=Type)
+@receiver(post_save, sender=TypeEfficacy)
+@receiver(post_delete, sender=TypeEfficacy)
+def clear_type_chart(**kwargs):
+    _chart['chart'] = None
@@ -72,5 +72,16 @@ router.register(r"version-group", VersionGroupResource)
 urlpatterns = [
     url(r'^api/v2/', include(router.urls)),
     url(r'^api/v2/pokemon/(?P<pokemon_id>\d+)/encounters',
-        PokemonEncounterView.as_view(), name='pokemon_encounters')
+        PokemonEncounterView.as_view(), name='pokemon_encounters'),
+    url(r'^api/v2/pokemon/(?P<pokemon_id>\d+)/moves/$',
+        PokemonMoveView.as_view(), name='pokemon_moves'),
+    url(r'^api/v2/pokemon-species/(?P<pokemon_species_id>\d+)/evolution-chain/$',
+        PokemonSpeciesEvolutionChainView.as_view(), name='pokemon_species_evolution_chain'),
+    url(r'^api/v2/type-matchup/$', TypeMatchupView.as_view(), name='type_matchup'),
+    url(r'^api/v2/debug/query-plan/(?P<resource>[a-z\-]+)/$',
+        QueryPlanView.as_view(viewsets={
+            prefix: viewset for prefix, viewset, basename in router.registry}),
+        name='query_plan'),
+    url(r'^api/v2/debug/response-cache/$',
+        ResponseCacheStatsView.as_view(), name='response_cache_stats')
 ]